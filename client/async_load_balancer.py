@@ -0,0 +1,254 @@
+import asyncio
+import os
+import traceback
+import uuid
+
+import aiohttp
+from aiohttp import web
+
+from consistent_hash import ConsistentHash
+from endpoint_registry import EndpointRegistry
+from health_check import HealthChecker
+from load_tracker import LoadTracker
+import provisioner
+from upstream_pool import DEFAULT_IDLE_TIMEOUT, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, relayable_headers
+
+# Also the connector's per-host connection limit, so every admitted forward
+# has a connection and none queue unseen inside aiohttp
+BACKEND_CONCURRENCY = int(os.getenv("BACKEND_CONCURRENCY", str(DEFAULT_POOL_SIZE)))
+BACKEND_QUEUE = int(os.getenv("BACKEND_QUEUE", "256"))
+BOUNDED_LOAD_EPSILON = os.getenv("BOUNDED_LOAD_EPSILON")  # unset → plain ring lookups
+LOAD_SOURCE = os.getenv("LOAD_SOURCE", "inflight")  # "inflight" or "rate"
+LOAD_RATE_WINDOW = float(os.getenv("LOAD_RATE_WINDOW", "1"))
+HASH_FUNCTION = os.getenv("HASH_FUNCTION", "blake2b")  # blake2b, fnv1a, sha256 or lab
+PLACEMENT = os.getenv("PLACEMENT", "ring")  # ring, jump or maglev
+PROXY_MODE = os.getenv("PROXY_MODE", "passthrough")  # passthrough or envelope
+
+loads = LoadTracker(LOAD_SOURCE, LOAD_RATE_WINDOW)  # hostname → live load
+ch = ConsistentHash(
+    epsilon=float(BOUNDED_LOAD_EPSILON) if BOUNDED_LOAD_EPSILON else None,
+    loads=loads,
+    hash_function=HASH_FUNCTION,
+    placement=PLACEMENT
+)
+servers = EndpointRegistry()  # container_id ↔ hostname, host ports
+limiters = {}  # hostname → BackendLimiter
+health = HealthChecker(ch, servers)
+
+class Overloaded(Exception):
+    pass
+
+class BackendLimiter:
+    """Caps in-flight forwards to one backend and bounds the queue behind it.
+
+    Requests beyond `limit` wait for a slot; once `max_queue` are already
+    waiting, new ones are rejected straight away instead of piling up.
+    """
+
+    def __init__(self, limit=BACKEND_CONCURRENCY, max_queue=BACKEND_QUEUE):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self._sem = asyncio.Semaphore(limit)
+
+    async def __aenter__(self):
+        if self._sem.locked():
+            if self.waiting >= self.max_queue:
+                raise Overloaded()
+            self.waiting += 1
+            try:
+                await self._sem.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._sem.acquire()
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.in_flight -= 1
+        self._sem.release()
+
+def replica_state():
+    return web.json_response({
+        "message": {
+            "N": len(servers),
+            "replicas": servers.names(),
+            "health": health.snapshot()
+        },
+        "status": "successful"
+    })
+
+async def replicas(request):
+    return replica_state()
+
+async def start_server(name, server_id):
+    """Starts a container and puts it in the ring once its /heartbeat answers."""
+    loop = asyncio.get_running_loop()
+    container_id = await loop.run_in_executor(None, provisioner.run_container, name, server_id)
+    if not container_id:
+        return None
+
+    # Registered only once ready, so /rep and /rm never see a pending container
+    host = servers.host
+    port = await loop.run_in_executor(None, servers.resolve_port, container_id)
+    if not port:
+        port = await loop.run_in_executor(None, servers.resolve_port, container_id)
+
+    if not await loop.run_in_executor(None, provisioner.wait_ready, host, port):
+        await loop.run_in_executor(None, provisioner.stop_container, name)
+        return None
+
+    servers.register(container_id, name, port)
+    limiters[name] = BackendLimiter()
+    ch.add_server(name)
+    return container_id
+
+async def stop_server(name):
+    """Takes a server out of the ring, lets in-flight requests drain, then stops it."""
+    loop = asyncio.get_running_loop()
+    health.remove(name)
+    await loop.run_in_executor(None, provisioner.wait_drained, lambda: loads.in_flight.get(name, 0))
+    servers.unregister(name)
+    limiters.pop(name, None)
+    loads.forget(name)
+    await loop.run_in_executor(None, provisioner.stop_container, name)
+
+async def add_servers(request):
+    data = await request.json()
+    n = data.get("n", 0)
+    hostnames = data.get("hostnames", [])
+
+    if len(hostnames) > n:
+        return web.json_response({
+            "message": "<Error> Length of hostname list is more than newly added instances",
+            "status": "failure"
+        }, status=400)
+
+    names = [
+        hostnames[i] if i < len(hostnames) else f"server-{uuid.uuid4().hex[:6]}"
+        for i in range(n)
+    ]
+    await asyncio.gather(*(start_server(name, i + 1) for i, name in enumerate(names)))
+
+    return replica_state()
+
+async def remove_servers(request):
+    data = await request.json()
+    n = data.get("n", 0)
+    hostnames = data.get("hostnames", [])
+
+    if len(hostnames) > n:
+        return web.json_response({
+            "message": "<Error> Length of hostname list is more than removable instances",
+            "status": "failure"
+        }, status=400)
+
+    if hostnames:
+        to_remove = [h for h in hostnames if servers.container_id(h)]
+    else:
+        to_remove = [h for _, h in servers.items()[:n]]
+
+    await asyncio.gather(*(stop_server(h) for h in to_remove))
+
+    return replica_state()
+
+async def route_request(request):
+    req_id = request.query.get("id")
+    target_server = ch.get_server(req_id)
+
+    if not target_server:
+        return web.json_response({
+            "message": "<Error> No server found to handle this request",
+            "status": "failure"
+        }, status=400)
+
+    endpoint = servers.endpoint(target_server)
+    limiter = limiters.get(target_server)
+    if not endpoint or limiter is None:
+        return web.json_response({
+            "message": "<Error> Target container not found",
+            "status": "failure"
+        }, status=404)
+
+    cid, host, port = endpoint
+    if not port:
+        return web.json_response({
+            "message": "<Error> Target container is not running",
+            "status": "failure"
+        }, status=503)
+
+    response = None
+    try:
+        async with limiter:
+            with loads.track(target_server):
+                session = request.app["upstream"]
+                async with session.get(f"http://{host}:{port}/home") as res:
+                    if PROXY_MODE == "envelope":
+                        body = await res.json(content_type=None)
+                    else:
+                        # Stream the body through undecoded
+                        headers = relayable_headers(res.headers.items())
+                        headers += [("X-Forwarded-To", target_server), ("X-Container-Id", cid)]
+                        response = web.StreamResponse(status=res.status, headers=headers)
+                        await response.prepare(request)
+                        async for chunk in res.content.iter_any():
+                            await response.write(chunk)
+                        await response.write_eof()
+                        return response
+
+        return web.json_response({
+            "forwarded_to": target_server,
+            "handled_by_container": cid,
+            "container_response": body
+        })
+
+    except Overloaded:
+        return web.json_response({
+            "message": f"<Error> Server {target_server} is overloaded",
+            "status": "failure"
+        }, status=503)
+
+    except Exception as e:
+        traceback.print_exc()
+        if response is not None and response.prepared:
+            raise  # headers already sent; let aiohttp drop the connection
+        return web.json_response({
+            "message": f"<Error> {str(e)}",
+            "status": "failure"
+        }, status=500)
+
+async def open_upstream(app):
+    connector = aiohttp.TCPConnector(
+        limit=0,
+        limit_per_host=BACKEND_CONCURRENCY,
+        keepalive_timeout=DEFAULT_IDLE_TIMEOUT,
+    )
+    app["upstream"] = aiohttp.ClientSession(
+        connector=connector,
+        # Per-operation limits, like the sync pool's socket timeouts: a total
+        # limit would cut off long streamed bodies that are still flowing.
+        # `connect` also bounds the wait for a free pooled connection.
+        timeout=aiohttp.ClientTimeout(total=None, connect=DEFAULT_TIMEOUT,
+                                      sock_connect=DEFAULT_TIMEOUT, sock_read=DEFAULT_TIMEOUT),
+        auto_decompress=PROXY_MODE == "envelope",
+    )
+
+async def close_upstream(app):
+    await app["upstream"].close()
+
+def create_app():
+    app = web.Application()
+    app.router.add_get("/rep", replicas)
+    app.router.add_post("/add", add_servers)
+    app.router.add_delete("/rm", remove_servers)
+    app.router.add_get("/home", route_request)
+    app.on_startup.append(open_upstream)
+    app.on_cleanup.append(close_upstream)
+    return app
+
+if __name__ == "__main__":
+    servers.watch_events()
+    health.start()
+    web.run_app(create_app(), host="0.0.0.0", port=6000)
@@ -0,0 +1,219 @@
+"""Offline benchmark for the consistent hash ring.
+
+Replays request ids against ConsistentHash with stubbed backends (no Docker)
+and reports, for every combination of hash function, placement, server
+count, virtual-node count and slot count:
+
+- lookup throughput of get_server and the batched get_servers
+- load distribution over the stub backends (max/mean ratio, stddev)
+- fraction of ids remapped when one server is added or removed
+
+Example:
+    python client/bench_ring.py --dist zipf --hash blake2b,lab \\
+        --placement ring,maglev --servers 3,6,12 --vnodes 9,50 --format json
+"""
+import argparse
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+
+from consistent_hash import ConsistentHash
+
+def ids_from_jsonl(path):
+    """Reads request ids from a JSON-lines file ("id" or "request_id" field)."""
+    ids = []
+    with open(path) as f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            ids.append(record.get("id", record.get("request_id", n)))
+    return ids
+
+def uniform_ids(count, universe, seed=0):
+    rng = random.Random(seed)
+    return [rng.randrange(universe) for _ in range(count)]
+
+def zipf_ids(count, universe, s=1.1, seed=0):
+    """Draws ids 0..universe-1 with P(k) ∝ 1 / (k + 1)^s."""
+    rng = random.Random(seed)
+    weights = [1.0 / (k + 1) ** s for k in range(universe)]
+    ids = rng.choices(range(universe), weights=weights, k=count)
+    # Spread the hot ranks over the id space so they aren't all small ints
+    shuffled = list(range(universe))
+    rng.shuffle(shuffled)
+    return [shuffled[k] for k in ids]
+
+class StubBackend:
+    """Stands in for a server container; only counts the requests it gets."""
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+
+    def handle(self, request_id):
+        self.requests += 1
+
+class StubCluster:
+    def __init__(self, ring, names):
+        self.ring = ring
+        self.backends = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        self.ring.add_server(name)
+        self.backends[name] = StubBackend(name)
+
+    def remove(self, name):
+        self.ring.remove_server(name)
+        self.backends.pop(name, None)
+
+    def replay(self, request_ids):
+        for backend, request_id in zip(self.ring.get_servers(request_ids), request_ids):
+            self.backends[backend].handle(request_id)
+
+    def counts(self):
+        return [b.requests for b in self.backends.values()]
+
+def lookup_throughput(ring, request_ids, min_time=0.2):
+    """Returns (single lookups/s, batched lookups/s)."""
+    get_server = ring.get_server
+    done, start = 0, time.perf_counter()
+    while True:
+        for r in request_ids:
+            get_server(r)
+        done += len(request_ids)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    single = done / elapsed
+
+    done, start = 0, time.perf_counter()
+    while True:
+        ring.get_servers(request_ids)
+        done += len(request_ids)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    return single, done / elapsed
+
+def percentile(ordered, q):
+    """Nearest-rank q-quantile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+def remap_fraction(before, after):
+    moved = sum(1 for a, b in zip(before, after) if a != b)
+    return moved / len(before) if before else 0.0
+
+def server_names(n):
+    return [f"server{i}" for i in range(1, n + 1)]
+
+def bench_config(request_ids, num_servers, num_virtual, total_slots, min_time=0.2,
+                 hash_function="blake2b", placement="ring"):
+    names = server_names(num_servers + 1)
+    result = {
+        "hash": hash_function,
+        "placement": placement,
+        "servers": num_servers,
+        "virtual_nodes": num_virtual,
+        "slots": total_slots if hash_function == "lab" else None,
+        "requests": len(request_ids),
+    }
+    if hash_function == "lab" and placement == "ring" and (num_servers + 1) * num_virtual > total_slots:
+        result["skipped"] = "ring too small for servers x virtual nodes"
+        return result
+
+    ring = ConsistentHash(total_slots=total_slots, num_virtual=num_virtual,
+                          hash_function=hash_function, placement=placement)
+    cluster = StubCluster(ring, names[:num_servers])
+    cluster.replay(request_ids)
+    counts = cluster.counts()
+    mean = statistics.mean(counts)
+    result["max_over_mean"] = max(counts) / mean if mean else 0.0
+    result["stddev"] = statistics.pstdev(counts)
+    result["idle_servers"] = sum(1 for c in counts if c == 0)
+
+    single, batched = lookup_throughput(ring, request_ids, min_time)
+    result["lookups_per_s"] = single
+    result["batch_lookups_per_s"] = batched
+
+    before = ring.get_servers(request_ids)
+    cluster.add(names[num_servers])
+    added = ring.get_servers(request_ids)
+    cluster.remove(names[num_servers])
+    restored = ring.get_servers(request_ids)
+    cluster.remove(names[0])
+    removed = ring.get_servers(request_ids)
+    result["remap_on_add"] = remap_fraction(before, added)
+    result["remap_on_remove"] = remap_fraction(restored, removed)
+    result["ideal_remap_on_add"] = 1 / (num_servers + 1)
+    result["ideal_remap_on_remove"] = 1 / num_servers
+    return result
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+def str_list(value):
+    return [v for v in value.split(",") if v]
+
+def format_row(r):
+    config = f"{r['hash']:<8} {r['placement']:<7} {r['servers']:>3} {r['virtual_nodes']:>4} {r['slots'] or '-':>8}"
+    if "skipped" in r:
+        return f"{config}  skipped: {r['skipped']}"
+    return (
+        config +
+        f" {r['lookups_per_s']:>12,.0f} {r['batch_lookups_per_s']:>12,.0f}"
+        f" {r['max_over_mean']:>8.2f} {r['stddev']:>9.1f}"
+        f" {r['remap_on_add']:>8.3f} {r['remap_on_remove']:>8.3f}"
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", help="JSON-lines file of request ids (e.g. requests.jsonl)")
+    parser.add_argument("--dist", choices=["uniform", "zipf"], default="uniform")
+    parser.add_argument("--requests", type=int, default=10000, help="synthetic ids to generate")
+    parser.add_argument("--universe", type=int, default=100000, help="distinct synthetic ids")
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hash", type=str_list, default=["blake2b"], help="comma-separated hash functions")
+    parser.add_argument("--placement", type=str_list, default=["ring"], help="comma-separated placements")
+    parser.add_argument("--servers", type=int_list, default=[3, 6, 12])
+    parser.add_argument("--vnodes", type=int_list, default=[9, 50])
+    parser.add_argument("--slots", type=int_list, default=[512, 65536], help="ring sizes (lab hash only)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per throughput measurement")
+    parser.add_argument("--format", choices=["table", "json"], default="table")
+    args = parser.parse_args(argv)
+
+    if args.ids:
+        request_ids = ids_from_jsonl(args.ids)
+    elif args.dist == "zipf":
+        request_ids = zipf_ids(args.requests, args.universe, args.zipf_s, args.seed)
+    else:
+        request_ids = uniform_ids(args.requests, args.universe, args.seed)
+
+    if args.format == "table":
+        print(f"{'hash':<8} {'place':<7} {'N':>3} {'V':>4} {'slots':>8} {'lookup/s':>12} {'batch/s':>12}"
+              f" {'max/mean':>8} {'stddev':>9} {'+1 moved':>8} {'-1 moved':>8}")
+    # Only the lab formulas depend on the slot count; 64-bit hashes would
+    # repeat the same configuration once per --slots value
+    configs = (
+        (h, p, n, v, m)
+        for h, p, n, v in itertools.product(args.hash, args.placement, args.servers, args.vnodes)
+        for m in (args.slots if h == "lab" else args.slots[:1])
+    )
+    for h, p, n, v, m in configs:
+        result = bench_config(request_ids, n, v, m, args.min_time, h, p)
+        if args.format == "json":
+            print(json.dumps(result), flush=True)
+        else:
+            print(format_row(result), flush=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Offline tail-latency comparison of the load balancer's routing modes.
+
+Simulates Poisson arrivals against stub backends (no Docker). Each backend
+serves `--workers` requests at a time, FIFO-queues the rest and has
+exponential service times; `--slow` of them are `--slow-factor` times
+slower, like a replica stuck in GC or next to a noisy neighbour. Every
+mode routes with the real Router over a real ConsistentHash, reading a
+LoadTracker that the simulation feeds exactly as the forwarding path
+does (in-flight counts, and latency at completion). The arrival rate is
+`--load` times the cluster's total capacity.
+
+Reports p50/p90/p99/p999/max latency per mode, and the share of requests
+each mode sent to the slow backends.
+
+Example:
+    python client/bench_routing.py --servers 6 --slow 1 --slow-factor 10 --load 0.7
+"""
+import argparse
+import heapq
+import json
+import random
+import sys
+from collections import deque
+
+from bench_ring import ids_from_jsonl, percentile, server_names, str_list, uniform_ids, zipf_ids
+from consistent_hash import ConsistentHash
+from load_tracker import LoadTracker
+from routing import ROUTING_MODES, Router
+
+class SimBackend:
+    """A stub backend with `workers` parallel slots and a FIFO queue."""
+
+    def __init__(self, name, workers, mean_service):
+        self.name = name
+        self.workers = workers
+        self.mean_service = mean_service
+        self.busy = 0
+        self.queue = deque()  # arrival times waiting for a slot
+        self.requests = 0
+
+def simulate(request_ids, mode, num_servers=6, slow=1, slow_factor=10.0, workers=4,
+             service=0.01, load=0.7, epsilon=None, seed=0):
+    """Replays request_ids as Poisson arrivals routed by `mode`; returns a result row."""
+    rng = random.Random(seed)
+    loads = LoadTracker()
+    ring = ConsistentHash(epsilon=epsilon, loads=loads)
+    router = Router(ring, loads, mode, seed=seed)
+    backends = {}
+    for i, name in enumerate(server_names(num_servers)):
+        mean = service * (slow_factor if i < slow else 1.0)
+        backends[name] = SimBackend(name, workers, mean)
+        ring.add_server(name)
+    capacity = sum(b.workers / b.mean_service for b in backends.values())
+    rate = load * capacity
+
+    events = []  # (time, seq, backend or None for an arrival, arrival time)
+    seq = 0
+    latencies = []
+
+    def begin(now, backend, arrived):
+        nonlocal seq
+        backend.busy += 1
+        seq += 1
+        heapq.heappush(events, (now + rng.expovariate(1 / backend.mean_service), seq, backend, arrived))
+
+    heapq.heappush(events, (rng.expovariate(rate), 0, None, 0.0))
+    sent = 0
+    while events:
+        now, _, backend, arrived = heapq.heappop(events)
+        if backend is None:
+            name = router.get_server(request_ids[sent % len(request_ids)])
+            sent += 1
+            target = backends[name]
+            target.requests += 1
+            loads.start(name)
+            if target.busy < target.workers:
+                begin(now, target, now)
+            else:
+                target.queue.append(now)
+            if sent < len(request_ids):
+                seq += 1
+                heapq.heappush(events, (now + rng.expovariate(rate), seq, None, 0.0))
+        else:
+            latency = now - arrived
+            latencies.append(latency)
+            loads.finish(backend.name)
+            loads.record_latency(backend.name, latency)
+            backend.busy -= 1
+            if backend.queue:
+                begin(now, backend, backend.queue.popleft())
+
+    latencies.sort()
+    slow_names = server_names(num_servers)[:slow]
+    result = {
+        "mode": mode if epsilon is None or mode != "ring" else f"ring(ε={epsilon})",
+        "servers": num_servers,
+        "slow": slow,
+        "load": load,
+        "requests": len(latencies),
+        "slow_share": sum(backends[n].requests for n in slow_names) / len(latencies) if latencies else 0.0,
+        "max": latencies[-1] if latencies else None,
+    }
+    for label, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999)):
+        result[label] = percentile(latencies, q)
+    return result
+
+def ms(value):
+    return f"{value * 1000:>9.1f}" if value is not None else f"{'-':>9}"
+
+def format_row(r):
+    return (
+        f"{r['mode']:<18} {r['requests']:>8} {r['slow_share'] * 100:>6.1f}%"
+        + "".join(ms(r[q]) for q in ("p50", "p90", "p99", "p999", "max"))
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", type=str_list, default=list(ROUTING_MODES), help="comma-separated routing modes")
+    parser.add_argument("--epsilon", type=float, help="also run ring routing with bounded loads")
+    parser.add_argument("--servers", type=int, default=6)
+    parser.add_argument("--slow", type=int, default=1, help="number of slow backends")
+    parser.add_argument("--slow-factor", type=float, default=10.0, help="service time multiplier of slow backends")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests per backend")
+    parser.add_argument("--service", type=float, default=0.01, help="mean service time in seconds")
+    parser.add_argument("--load", type=float, default=0.7, help="arrival rate as a fraction of total capacity")
+    parser.add_argument("--ids", help="JSON-lines file of request ids (e.g. requests.jsonl)")
+    parser.add_argument("--dist", choices=["uniform", "zipf"], default="uniform")
+    parser.add_argument("--requests", type=int, default=50000, help="synthetic ids to generate")
+    parser.add_argument("--universe", type=int, default=100000, help="distinct synthetic ids")
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["table", "json"], default="table")
+    args = parser.parse_args(argv)
+
+    for mode in args.modes:
+        if mode not in ROUTING_MODES:
+            parser.error(f"unknown routing mode '{mode}'")
+    if args.ids:
+        request_ids = ids_from_jsonl(args.ids)
+    elif args.dist == "zipf":
+        request_ids = zipf_ids(args.requests, args.universe, args.zipf_s, args.seed)
+    else:
+        request_ids = uniform_ids(args.requests, args.universe, args.seed)
+
+    runs = [(mode, None) for mode in args.modes]
+    if args.epsilon is not None:
+        runs.append(("ring", args.epsilon))
+    if args.format == "table":
+        print(f"{'mode':<18} {'requests':>8} {'to slow':>7}"
+              + "".join(f"{q + ' ms':>9}" for q in ("p50", "p90", "p99", "p999", "max")))
+    for mode, epsilon in runs:
+        result = simulate(request_ids, mode, args.servers, args.slow, args.slow_factor, args.workers,
+                          args.service, args.load, epsilon, args.seed)
+        if args.format == "json":
+            print(json.dumps(result), flush=True)
+        else:
+            print(format_row(result), flush=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
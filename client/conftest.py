@@ -0,0 +1,3 @@
+# test_*.py in this directory are scripts that drive the Docker cluster;
+# the offline unit tests live in tests/
+collect_ignore = ["test_client.py", "test_load_distribution.py", "test_scalability.py"]
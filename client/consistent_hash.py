@@ -1,17 +1,129 @@
+import hashlib
+import math
 import re
+import threading
+from bisect import bisect_left
 from collections import Counter
+from itertools import repeat
+
+MASK64 = (1 << 64) - 1
+
+def _fmix64(h):
+    """MurmurHash3 finalizer: spreads every input bit over all 64 output bits."""
+    h ^= h >> 33
+    h = (h * 0xff51afd7ed558ccd) & MASK64
+    h ^= h >> 33
+    h = (h * 0xc4ceb9fe1a85ec53) & MASK64
+    return h ^ (h >> 33)
+
+def fnv1a_64(data):
+    """64-bit FNV-1a over every byte of `data`, finalized with fmix64."""
+    h = 0xcbf29ce484222325
+    for byte in data:
+        h = ((h ^ byte) * 0x100000001b3) & MASK64
+    return _fmix64(h)
+
+def blake2b_64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+def sha256_64(data):
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], "little")
+
+# "lab" is the original H(i)/Φ(i,j) formulas, kept for compatibility
+HASH_FUNCTIONS = {
+    "lab": None,
+    "fnv1a": fnv1a_64,
+    "blake2b": blake2b_64,
+    "sha256": sha256_64,
+}
+PLACEMENTS = ("ring", "jump", "maglev")
+
+def jump_hash(key, num_buckets):
+    """Lamping & Veach jump consistent hash: maps a 64-bit key to 0..num_buckets-1."""
+    b, j = -1, 0
+    while j < num_buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & MASK64
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+def maglev_table(names, size, hash_fn):
+    """Builds a Maglev lookup table of `size` entries (size should be prime)."""
+    if not names:
+        return []
+    names = sorted(names)
+    offsets = [hash_fn(f"offset:{name}".encode()) % size for name in names]
+    skips = [hash_fn(f"skip:{name}".encode()) % (size - 1) + 1 for name in names]
+    nexts = [0] * len(names)
+    table = [None] * size
+    filled = 0
+    # Each backend in turn claims the next free entry of its own permutation
+    # (offset, offset + skip, offset + 2*skip, ...) until the table is full.
+    while True:
+        for i, name in enumerate(names):
+            offset, skip, n = offsets[i], skips[i], nexts[i]
+            c = (offset + n * skip) % size
+            while table[c] is not None:
+                n += 1
+                c = (offset + n * skip) % size
+            table[c] = name
+            nexts[i] = n + 1
+            filled += 1
+            if filled == size:
+                return table
 
 class ConsistentHash:
-    def __init__(self, total_slots=512, num_virtual=9):
+    """Maps request ids to servers.
+
+    `hash_function` picks how ids and virtual nodes are hashed: "lab" keeps
+    the original H(i)/Φ(i,j) formulas over `total_slots` slots, the others
+    hash the full id bytes to 64 bits. `placement` picks how hashes map to
+    servers: "ring" (virtual nodes on a sorted ring, bisect lookup), "jump"
+    (jump consistent hash over the join order) or "maglev" (precomputed
+    lookup table of `table_size` entries, O(1) lookup).
+    """
+
+    def __init__(self, total_slots=512, num_virtual=9, epsilon=None, loads=None,
+                 hash_function="blake2b", placement="ring", table_size=65537):
+        if hash_function not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown hash function '{hash_function}'")
+        if placement not in PLACEMENTS:
+            raise ValueError(f"Unknown placement '{placement}'")
         self.total_slots = total_slots
         self.num_virtual = num_virtual
+        self.hash_function = hash_function
+        self.placement = placement
+        self.table_size = table_size
+        self._hash = HASH_FUNCTIONS[hash_function]
+        # Lab slots are bounded by total_slots; 64-bit hashes use the full space
+        self.ring_size = total_slots if self._hash is None else 1 << 64
+        # Bounded-load mode: with both set, no server is handed a request
+        # while its load is at or above ceil((1 + epsilon) * average load).
+        # `loads` needs load(server_name) and total() methods.
+        self.epsilon = epsilon
+        self.loads = loads
         self.servers = {}  # {slot: server_name}
         self.virtual_servers = {}  # {server_name: [virtual_slots]}
         self.round_robin_order = []  # [server1, server2, ...]
         self.rr_index = 0
+        self.version = 0  # bumped on every membership change
+        # Sorted ring of virtual-node slots with a parallel array of owners,
+        # kept up to date by add_server/remove_server and searched by bisect.
+        # Updates build new arrays and swap the pair in one assignment, so
+        # lookups on other threads always see a consistent ring.
+        self._ring = ([], [])
+        self._buckets = []  # jump placement: servers by bucket number
+        self._table = []  # maglev placement: lookup table
+        self._lookup = getattr(self, f"_lookup_{placement}")
+        # Serializes membership changes; each one reads the current arrays
+        # before swapping in new ones, so two at once would lose an update
+        self._lock = threading.Lock()
+        self._walk = getattr(self, f"_walk_{placement}")
 
     def hash_request(self, request_id):
-        """Hash function for requests: H(i) = i^2 + 2i + 17 mod M"""
+        """Hash function for requests: H(i) = i^2 + 2i + 17 mod M in lab mode."""
+        if self._hash is not None:
+            return self._hash(str(request_id).encode())
         if isinstance(request_id, str):
             i = sum(ord(c) for c in request_id)
         else:
@@ -19,7 +131,9 @@ class ConsistentHash:
         return (i**2 + 2*i + 17) % self.total_slots
 
     def hash_virtual_server(self, server_name, replica_idx):
-        """Hash function for virtual server: Φ(i,j) = i^2 + j^2 + 2j + 25 mod M"""
+        """Hash function for virtual server: Φ(i,j) = i^2 + j^2 + 2j + 25 mod M in lab mode."""
+        if self._hash is not None:
+            return self._hash(f"{server_name}#{replica_idx}".encode())
         match = re.search(r'\d+', server_name)
         if not match:
             raise ValueError(f"No numeric ID found in server name '{server_name}'")
@@ -28,37 +142,257 @@ class ConsistentHash:
         return (i**2 + j**2 + 2*j + 25) % self.total_slots
 
     def add_server(self, server_name):
-        """Adds a physical server with its virtual replicas into the hash ring."""
+        """Adds a physical server (and its virtual replicas, on the ring)."""
+        with self._lock:
+            self._add_server(server_name)
+
+    def _add_server(self, server_name):
+        if server_name in self.round_robin_order:
+            return
+        if self.placement == "ring":
+            self._add_to_ring(server_name)
+        elif self.placement == "jump":
+            self._buckets = self._buckets + [server_name]
+        else:
+            self._table = maglev_table(self.round_robin_order + [server_name], self.table_size, self._maglev_hash)
+        self.round_robin_order = self.round_robin_order + [server_name]
+        self.version += 1
+
+    def remove_server(self, server_name):
+        """Removes a physical server (and its virtual replicas, on the ring)."""
+        with self._lock:
+            self._remove_server(server_name)
+
+    def _remove_server(self, server_name):
+        if server_name not in self.round_robin_order:
+            return
+        remaining = [s for s in self.round_robin_order if s != server_name]
+        if self.placement == "ring":
+            self._remove_from_ring(server_name)
+        elif self.placement == "jump":
+            # Jump hash can only shrink from the end, so the last bucket's
+            # server takes over the removed one's bucket number.
+            buckets = list(self._buckets)
+            idx = buckets.index(server_name)
+            last = buckets.pop()
+            if last != server_name:
+                buckets[idx] = last
+            self._buckets = buckets
+        else:
+            self._table = maglev_table(remaining, self.table_size, self._maglev_hash)
+        self.round_robin_order = remaining
+        self.rr_index %= max(len(self.round_robin_order), 1)
+        self.version += 1
+
+    def snapshot(self):
+        """Returns the ring state as plain JSON-serialisable data."""
+        return {
+            "version": self.version,
+            "order": self.round_robin_order,
+            "virtual_servers": self.virtual_servers,
+            "buckets": self._buckets,
+        }
+
+    def restore(self, snapshot):
+        """Replaces the ring state with one taken by snapshot() (same configuration)."""
+        with self._lock:
+            self._restore(snapshot)
+
+    def _restore(self, snapshot):
+        virtual_servers = {name: list(slots) for name, slots in snapshot["virtual_servers"].items()}
+        slot_map = {slot: name for name, slots in virtual_servers.items() for slot in slots}
+        ring = sorted(slot_map.items())
+        self.servers = slot_map
+        self.virtual_servers = virtual_servers
+        self._ring = ([slot for slot, _ in ring], [name for _, name in ring])
+        self._buckets = list(snapshot["buckets"])
+        if self.placement == "maglev":
+            self._table = maglev_table(snapshot["order"], self.table_size, self._maglev_hash)
+        self.round_robin_order = list(snapshot["order"])
+        self.rr_index %= max(len(self.round_robin_order), 1)
+        self.version = snapshot["version"]
+
+    def _add_to_ring(self, server_name):
+        if self._hash is None and len(self.servers) + self.num_virtual > self.total_slots:
+            raise Exception("Hash ring is full.")
+
+        slots, owners = list(self._ring[0]), list(self._ring[1])
         virtual_slots = []
         for j in range(self.num_virtual):
             slot = self.hash_virtual_server(server_name, j)
-            original_slot = slot
-            while slot in self.servers:
-                slot = (slot + 1) % self.total_slots
-                if slot == original_slot:
-                    raise Exception("Hash ring is full.")
+            # Linear probing to the next free slot: find the first ring entry
+            # at or after the slot and skip over the run of occupied slots.
+            idx = bisect_left(slots, slot)
+            while idx < len(slots) and slots[idx] == slot:
+                slot += 1
+                idx += 1
+                if slot == self.ring_size:
+                    slot, idx = 0, 0
             self.servers[slot] = server_name
+            slots.insert(idx, slot)
+            owners.insert(idx, server_name)
             virtual_slots.append(slot)
+        self._ring = (slots, owners)
         self.virtual_servers[server_name] = virtual_slots
 
-        if server_name not in self.round_robin_order:
-            self.round_robin_order.append(server_name)
-
-    def remove_server(self, server_name):
-        """Removes a physical server and its virtual replicas from the hash ring."""
+    def _remove_from_ring(self, server_name):
+        slots, owners = list(self._ring[0]), list(self._ring[1])
         for slot in self.virtual_servers.get(server_name, []):
             if slot in self.servers:
                 del self.servers[slot]
+                idx = bisect_left(slots, slot)
+                del slots[idx]
+                del owners[idx]
+        self._ring = (slots, owners)
         self.virtual_servers.pop(server_name, None)
 
-        if server_name in self.round_robin_order:
-            self.round_robin_order.remove(server_name)
-            self.rr_index %= max(len(self.round_robin_order), 1)
+    def _maglev_hash(self, data):
+        return (self._hash or blake2b_64)(data)
+
+    def __contains__(self, server_name):
+        return server_name in self.round_robin_order
+
+    def __len__(self):
+        return len(self.round_robin_order)
 
     def get_server(self, request_id=None):
-        """Returns the next server in round-robin order"""
-        if not self.round_robin_order:
+        """Returns the server that owns request_id under the configured placement.
+
+        Without a request id there is nothing to keep affinity for, so the
+        request falls back to round-robin order.
+        """
+        if request_id is None:
+            return self._next_round_robin()
+        if self.epsilon is not None and self.loads is not None:
+            return self._get_bounded(request_id)
+        return self._lookup(self.hash_request(request_id))
+
+    def _lookup_ring(self, key):
+        slots, owners = self._ring
+        if not slots:
+            return None
+        idx = bisect_left(slots, key)
+        if idx == len(slots):
+            idx = 0
+        return owners[idx]
+
+    def _lookup_jump(self, key):
+        buckets = self._buckets
+        if not buckets:
+            return None
+        return buckets[jump_hash(key, len(buckets))]
+
+    def _lookup_maglev(self, key):
+        table = self._table
+        if not table:
+            return None
+        return table[key % len(table)]
+
+    def iter_servers(self, request_id):
+        """Yields each distinct physical server in preference order for request_id.
+
+        On the ring this is clockwise from H(request_id); jump and maglev
+        continue from the owning bucket or table entry.
+        """
+        seen = set()
+        total = len(self.round_robin_order)
+        for server in self._walk(self.hash_request(request_id)):
+            if server not in seen:
+                seen.add(server)
+                yield server
+                # Stop instead of scanning the rest of the ring or the
+                # Maglev table once every server has been yielded
+                if len(seen) >= total:
+                    return
+
+    def _walk_ring(self, key):
+        slots, owners = self._ring
+        n = len(slots)
+        start = bisect_left(slots, key)
+        for k in range(n):
+            yield owners[(start + k) % n]
+
+    def _walk_jump(self, key):
+        buckets = self._buckets
+        n = len(buckets)
+        if not n:
+            return
+        start = jump_hash(key, n)
+        for k in range(n):
+            yield buckets[(start + k) % n]
+
+    def _walk_maglev(self, key):
+        table = self._table
+        n = len(table)
+        for k in range(n):
+            yield table[(key + k) % n]
+
+    def capacity(self):
+        """Per-server load bound for the next request in bounded-load mode."""
+        n = len(self.round_robin_order)
+        if not n:
+            return 0
+        return math.ceil((1 + self.epsilon) * (self.loads.total() + 1) / n)
+
+    def _get_bounded(self, request_id):
+        # Walk past servers already at capacity. The first server under the
+        # bound wins, so keys keep their usual owner unless it is overloaded;
+        # if every server is full the usual owner is used.
+        capacity = self.capacity()
+        load = self.loads.load
+        first = None
+        for server in self.iter_servers(request_id):
+            if load(server) < capacity:
+                return server
+            if first is None:
+                first = server
+        return first
+
+    def get_servers(self, request_ids):
+        """Looks up a batch of request ids, preserving order.
+
+        Batch lookups ignore bounded-load limits. On the ring with a 64-bit
+        hash the encode, hash and bisect steps are chained through map() so
+        the per-id loop runs in C, which saves roughly a fifth over calling
+        get_server() per id. The hash itself (about 1 µs per id for blake2b
+        in CPython) still dominates, so a lookup costs 2 µs or so at
+        thousands of virtual nodes either way; there is no vectorized path
+        without a numeric library.
+        """
+        if self.placement != "ring" or self._hash is None:
+            hash_request, lookup = self.hash_request, self._lookup
+            return [lookup(hash_request(r)) for r in request_ids]
+        slots, owners = self._ring
+        if not slots:
+            return [None] * len(request_ids)
+        # A hash past the last slot wraps around to the first owner
+        wrapped = owners + owners[:1]
+        hashes = map(self._hash, map(str.encode, map(str, request_ids)))
+        return list(map(wrapped.__getitem__, map(bisect_left, repeat(slots), hashes)))
+
+    def ownership(self):
+        """Returns the share of the hash space each server owns (sums to 1)."""
+        if self.placement == "jump":
+            n = len(self._buckets)
+            return {server: 1 / n for server in self._buckets}
+        if self.placement == "maglev":
+            table = self._table
+            return {server: count / len(table) for server, count in Counter(table).items()}
+        slots, owners = self._ring
+        if not slots:
+            return {}
+        # Each virtual node owns the arc from its predecessor (exclusive) to itself
+        shares = Counter()
+        prev = slots[-1] - self.ring_size
+        for slot, owner in zip(slots, owners):
+            shares[owner] += slot - prev
+            prev = slot
+        return {server: arc / self.ring_size for server, arc in shares.items()}
+
+    def _next_round_robin(self):
+        order = self.round_robin_order
+        if not order:
             return None
-        server = self.round_robin_order[self.rr_index]
-        self.rr_index = (self.rr_index + 1) % len(self.round_robin_order)
-        return server
+        idx = self.rr_index % len(order)
+        self.rr_index = (idx + 1) % len(order)
+        return order[idx]
@@ -0,0 +1,141 @@
+import subprocess
+import threading
+import traceback
+from contextlib import nullcontext
+
+PORT_FORMAT = "{{(index (index .NetworkSettings.Ports \"5000/tcp\") 0).HostPort}}"
+
+class EndpointRegistry:
+    """In-memory table of backend containers and the host ports they listen on.
+
+    Ports are resolved with `docker inspect` once, when a container is
+    registered, and refreshed from `docker events` afterwards, so looking up
+    an endpoint never spawns a process.
+    """
+
+    def __init__(self, host="localhost"):
+        self.host = host
+        self._lock = threading.Lock()
+        self._names = {}  # container_id → hostname
+        self._cids = {}   # hostname → container_id
+        self._ports = {}  # container_id → host port (None while not running)
+        self._events = None
+
+    def register(self, container_id, name, port=None):
+        """Adds a container, resolving its host port unless one is given."""
+        if port is None:
+            port = self.resolve_port(container_id)
+        with self._lock:
+            self._names[container_id] = name
+            self._cids[name] = container_id
+            self._ports[container_id] = port
+
+    def unregister(self, name):
+        """Drops a container by hostname, returning its id (or None)."""
+        with self._lock:
+            cid = self._cids.pop(name, None)
+            if cid is not None:
+                self._names.pop(cid, None)
+                self._ports.pop(cid, None)
+            return cid
+
+    def container_id(self, name):
+        return self._cids.get(name)
+
+    def endpoint(self, name):
+        """Returns (container_id, host, port) for a hostname, or None if unknown.
+
+        The port is None while the container is not running.
+        """
+        cid = self._cids.get(name)
+        if cid is None:
+            return None
+        return cid, self.host, self._ports.get(cid)
+
+    def names(self):
+        return list(self._names.values())
+
+    def items(self):
+        return list(self._names.items())
+
+    def __len__(self):
+        return len(self._names)
+
+    def snapshot(self):
+        """Returns {hostname: [container_id, port]} in registration order."""
+        with self._lock:
+            return {name: [cid, self._ports.get(cid)] for cid, name in self._names.items()}
+
+    def restore(self, snapshot):
+        """Replaces the table with one taken by snapshot(), without asking Docker."""
+        names = {cid: name for name, (cid, _) in snapshot.items()}
+        cids = {name: cid for name, (cid, _) in snapshot.items()}
+        ports = {cid: port for cid, port in snapshot.values()}
+        with self._lock:
+            self._names, self._cids, self._ports = names, cids, ports
+
+    def resolve_port(self, container_id):
+        """Asks Docker for the host port mapped to the container's port 5000."""
+        try:
+            out = subprocess.check_output(
+                ["docker", "inspect", container_id, "--format", PORT_FORMAT],
+                stderr=subprocess.DEVNULL,
+            )
+            return out.decode().strip() or None
+        except (subprocess.CalledProcessError, OSError):
+            return None
+
+    def refresh(self, container_id):
+        """Re-resolves the host port of a known container."""
+        if container_id not in self._names:
+            return
+        port = self.resolve_port(container_id)
+        with self._lock:
+            if container_id in self._names:
+                self._ports[container_id] = port
+
+    def invalidate(self, container_id):
+        """Marks a known container as not running until it is refreshed."""
+        with self._lock:
+            if container_id in self._names:
+                self._ports[container_id] = None
+
+    def handle_event(self, status, container_id):
+        """Applies one `docker events` container status to the table."""
+        if container_id not in self._names:
+            return
+        if status in ("start", "restart", "unpause"):
+            self.refresh(container_id)
+        elif status in ("die", "stop", "kill", "pause", "oom"):
+            self.invalidate(container_id)
+        elif status == "destroy":
+            name = self._names.get(container_id)
+            if name is not None:
+                self.unregister(name)
+
+    def watch_events(self, update=None):
+        """Follows `docker events` on a daemon thread to keep ports current.
+
+        Each event is applied inside `update()` if given (a context manager).
+        """
+        if self._events is not None:
+            return
+        self._events = threading.Thread(target=self._follow_events, args=(update or nullcontext,), daemon=True)
+        self._events.start()
+
+    def _follow_events(self, update):
+        cmd = [
+            "docker", "events",
+            "--filter", "type=container",
+            "--format", "{{.Status}} {{.ID}}",
+        ]
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        except OSError:
+            traceback.print_exc()
+            return
+        for line in proc.stdout:
+            parts = line.split()
+            if len(parts) == 2 and parts[1] in self._names:
+                with update():
+                    self.handle_event(parts[0], parts[1])
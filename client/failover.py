@@ -0,0 +1,226 @@
+import http.client
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from upstream_pool import Cancel, PoolClosed
+
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN = float(os.getenv("RETRY_BUDGET_MIN", "10"))
+HEDGE = os.getenv("HEDGE", "0") == "1"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.005"))
+
+# Connect errors, resets and timeouts (TimeoutError is an OSError)
+RETRYABLE = (OSError, http.client.HTTPException, PoolClosed)
+
+class RetryBudget:
+    """Caps retries and hedges at `ratio` of recent requests plus `min_per_sec`.
+
+    Counts decay over `window` seconds, so when a whole backend tier is
+    failing the extra load from retries stays bounded instead of multiplying
+    the outage.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_per_sec=RETRY_BUDGET_MIN, window=10.0):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.window = window
+        self._requests = 0.0
+        self._retries = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _decay(self, now):
+        factor = math.exp((self._updated - now) / self.window)
+        self._requests *= factor
+        self._retries *= factor
+        self._updated = now
+
+    def record_request(self):
+        with self._lock:
+            self._decay(time.monotonic())
+            self._requests += 1
+
+    def try_spend(self):
+        """Returns True (and counts it) if a retry or hedge is allowed now."""
+        with self._lock:
+            self._decay(time.monotonic())
+            allowed = self.ratio * self._requests + self.min_per_sec * self.window
+            if self._retries + 1 > allowed:
+                return False
+            self._retries += 1
+            return True
+
+class LatencyWindow:
+    """Recent upstream latencies, for picking the hedge delay."""
+
+    def __init__(self, size=1000, refresh=100):
+        self.size = size
+        self.refresh = refresh
+        self._samples = [0.0] * size
+        self._count = 0
+        self._cached = {}
+
+    def record(self, seconds):
+        self._samples[self._count % self.size] = seconds
+        self._count += 1
+        if self._count % self.refresh == 0:
+            self._cached = {}
+
+    def quantile(self, q):
+        """Returns the q-quantile of recent samples (None before any sample).
+
+        The sorted window is recomputed every `refresh` samples, not per call.
+        """
+        value = self._cached.get(q)
+        if value is None:
+            n = min(self._count, self.size)
+            if not n:
+                return None
+            ordered = sorted(self._samples[:n])
+            value = ordered[min(int(q * n), n - 1)]
+            self._cached[q] = value
+        return value
+
+class Failover:
+    """Sends a request to its preferred server, falling back along the ring.
+
+    On a retryable error the request moves to the next distinct server in
+    `candidates`, up to `attempts` servers. With `hedge` enabled, a duplicate
+    goes to the next server if the first has not answered within the
+    HEDGE_QUANTILE latency, and the first successful answer wins. Retries
+    and hedges both draw on the shared RetryBudget.
+    """
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, budget=None, hedge=HEDGE,
+                 hedge_quantile=HEDGE_QUANTILE, hedge_min_delay=HEDGE_MIN_DELAY):
+        self.attempts = attempts
+        self.budget = budget or RetryBudget()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyWindow()
+        self._executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="hedge") if hedge else None
+
+    def call(self, candidates, send, discard=None):
+        """Runs send(server) over candidates; returns (server, result).
+
+        When hedging, the primary attempt runs on the calling thread as
+        send(server, cancel) and the duplicate on the hedge executor as
+        send(server); if the duplicate answers first it calls
+        cancel.cancel() to abort the primary. discard(server, result) is
+        called for any successful answer that lost the race, so it can
+        release what it holds. Raises the last retryable error if every
+        permitted attempt failed.
+        """
+        self.budget.record_request()
+        candidates = iter(candidates)
+        if self.hedge:
+            return self._call_hedged(candidates, send, discard)
+        return self._retry(candidates, send, 0, None)
+
+    def _retry(self, candidates, send, tried, error):
+        for server in candidates:
+            if tried and (tried >= self.attempts or not self.budget.try_spend()):
+                break
+            tried += 1
+            try:
+                return server, self._timed(send, server)
+            except RETRYABLE as e:
+                error = e
+        if error is None:
+            raise ConnectionError("No server available")
+        raise error
+
+    def _timed(self, send, server, *args):
+        start = time.perf_counter()
+        result = send(server, *args)
+        self.latency.record(time.perf_counter() - start)
+        return result
+
+    def _hedge_delay(self):
+        delay = self.latency.quantile(self.hedge_quantile)
+        return max(delay or 0.0, self.hedge_min_delay)
+
+    def _call_hedged(self, candidates, send, discard):
+        primary = next(candidates, None)
+        if primary is None:
+            raise ConnectionError("No server available")
+        race = _Race()
+        cancel = Cancel()
+        hedge = self._executor.submit(self._send_hedge, race, candidates, send, discard, cancel)
+
+        error = None
+        try:
+            try:
+                result = self._timed(send, primary, cancel)
+            finally:
+                race.primary_done.set()
+        except RETRYABLE as e:
+            error = e
+        except BaseException:
+            # Nothing to fall back on, but a hedge that already went out may
+            # still win and hold on to what it got
+            if not hedge.cancel():
+                wait([hedge])
+            if race.winner is not None and discard is not None:
+                discard(*race.winner)
+            raise
+        else:
+            if race.offer(primary, result):
+                return primary, result
+            if discard is not None:
+                discard(primary, result)
+
+        # The primary failed or lost: use the duplicate's answer if there is one
+        hedge_error = None if hedge.cancel() else hedge.result()
+        if race.winner is not None:
+            return race.winner
+        tried = 1
+        if race.hedged:
+            tried, error = 2, hedge_error or error
+        return self._retry(candidates, send, tried, error)
+
+    def _send_hedge(self, race, candidates, send, discard, cancel):
+        """Sends the duplicate if the primary is still waiting after the hedge delay.
+
+        Returns the duplicate's retryable error, if it failed.
+        """
+        if race.primary_done.wait(self._hedge_delay()):
+            return None
+        if not self.budget.try_spend() or self.attempts < 2:
+            return None
+        server = next(candidates, None)
+        if server is None:
+            return None
+        race.hedged = True
+        try:
+            result = self._timed(send, server)
+        except RETRYABLE as e:
+            return e
+        if race.offer(server, result):
+            cancel.cancel()
+        elif discard is not None:
+            discard(server, result)
+        return None
+
+class _Race:
+    """The first successful answer of a hedged call."""
+
+    def __init__(self):
+        self.primary_done = threading.Event()
+        self.hedged = False
+        self.winner = None  # (server, result)
+        self._lock = threading.Lock()
+
+    def offer(self, server, result):
+        """Records (server, result) if nothing has won yet; returns True if it won."""
+        with self._lock:
+            if self.winner is not None:
+                return False
+            self.winner = (server, result)
+            return True
@@ -0,0 +1,174 @@
+import http.client
+import os
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "5"))
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "1"))
+HEALTH_FAILURES = int(os.getenv("HEALTH_FAILURES", "3"))
+HEALTH_RECOVERY = int(os.getenv("HEALTH_RECOVERY", "2"))
+
+def heartbeat(host, port, timeout=HEALTH_TIMEOUT):
+    """Returns None if the server's /heartbeat answers 200, else an error string."""
+    conn = http.client.HTTPConnection(host, int(port), timeout=timeout)
+    try:
+        conn.request("GET", "/heartbeat")
+        res = conn.getresponse()
+        res.read()
+        if res.status != 200:
+            return f"heartbeat returned {res.status}"
+        return None
+    except (OSError, http.client.HTTPException) as e:
+        return str(e) or type(e).__name__
+    finally:
+        conn.close()
+
+class BackendHealth:
+    def __init__(self):
+        self.healthy = True
+        self.in_ring = True
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.last_checked = None
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            "healthy": self.healthy,
+            "in_ring": self.in_ring,
+            "consecutive_failures": self.consecutive_failures,
+            "last_checked": self.last_checked,
+            "last_error": self.last_error,
+        }
+
+class HealthChecker:
+    """Probes every registered backend's /heartbeat on a background thread.
+
+    A backend that fails `failures` probes in a row is taken out of the ring
+    and put back after `recovery` consecutive successes. If `respawn` is
+    given it is called with the hostname of each evicted backend so a
+    replacement can be started; `on_evict`, if given, is called with it
+    right after the eviction. Ring changes run inside `update()`, a
+    context manager the load balancer can use to publish them.
+    """
+
+    def __init__(self, ring, registry, interval=HEALTH_INTERVAL, timeout=HEALTH_TIMEOUT,
+                 failures=HEALTH_FAILURES, recovery=HEALTH_RECOVERY, respawn=None, update=None,
+                 on_evict=None):
+        self.ring = ring
+        self.registry = registry
+        self.interval = interval
+        self.timeout = timeout
+        self.failures = failures
+        self.recovery = recovery
+        self.respawn = respawn
+        self.update = update or nullcontext
+        self.on_evict = on_evict
+        self.state = {}  # hostname → BackendHealth
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="heartbeat")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_all()
+            except Exception:
+                traceback.print_exc()
+
+    def check_all(self):
+        """Probes the ring's members, and evicted backends, concurrently.
+
+        Members are walked rather than the registry so a container that
+        disappeared (`docker run --rm` destroys it right after it dies)
+        keeps failing its probes until it is evicted.
+        """
+        members = list(self.ring.round_robin_order)
+        registered = set(self.registry.names())
+        with self._lock:
+            for gone in [n for n in self.state if n not in registered and n not in members]:
+                del self.state[gone]
+            names = members + [n for n in self.state if n not in members]
+        results = list(self._executor.map(self.probe, names))
+        for name, error in zip(names, results):
+            self.record(name, error)
+
+    def probe(self, name):
+        """Probes a registered backend; returns None if healthy, else an error string."""
+        endpoint = self.registry.endpoint(name)
+        if endpoint is None:
+            return "not registered"
+        _, host, port = endpoint
+        if not port:
+            return "container not running"
+        return heartbeat(host, port, self.timeout)
+
+    def record(self, name, error):
+        """Updates a backend's health from one probe, evicting or re-admitting it."""
+        evicted = False
+        with self._lock:
+            health = self.state.get(name)
+            if health is None:
+                # Servers still starting up or draining are not in the ring;
+                # only the load balancer admits or removes them.
+                if name not in self.ring:
+                    return
+                health = self.state[name] = BackendHealth()
+            health.last_checked = time.time()
+            health.last_error = error
+            if error is None:
+                health.consecutive_failures = 0
+                health.consecutive_successes += 1
+                health.healthy = True
+                if not health.in_ring and health.consecutive_successes >= self.recovery:
+                    with self.update():
+                        self.ring.add_server(name)
+                    health.in_ring = True
+            else:
+                health.consecutive_successes = 0
+                health.consecutive_failures += 1
+                if health.consecutive_failures >= self.failures:
+                    health.healthy = False
+                    if health.in_ring:
+                        with self.update():
+                            self.ring.remove_server(name)
+                        health.in_ring = False
+                        evicted = True
+        if evicted and self.on_evict is not None:
+            self.on_evict(name)
+        if evicted and self.respawn is not None:
+            self._executor.submit(self._respawn, name)
+
+    def _respawn(self, name):
+        try:
+            self.respawn(name)
+        except Exception:
+            traceback.print_exc()
+
+    def remove(self, name):
+        """Takes a backend out of the ring and forgets its health, for /rm.
+
+        Both happen under the lock record() holds, so a probe that is just
+        re-admitting an evicted backend cannot put it back in the ring
+        while it is being stopped.
+        """
+        with self._lock:
+            self.state.pop(name, None)
+            with self.update():
+                self.ring.remove_server(name)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: health.to_dict() for name, health in self.state.items()}
@@ -1,26 +1,258 @@
 import os
 import uuid
 import json
-import subprocess
+import signal
+import socket
 import sys
+import threading
+import time
 import traceback
-from flask import Flask, request, jsonify
+from contextlib import contextmanager
+from flask import Flask, Response, request, jsonify
+from werkzeug.serving import make_server
 
 # Import consistent hashing class from Task 2
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'custom_hash')))
 from consistent_hash import ConsistentHash
+from endpoint_registry import EndpointRegistry
+from upstream_pool import PoolManager, PoolExhausted, relayable_headers
+from health_check import HealthChecker
+from load_tracker import LoadTracker
+import provisioner
+from failover import Failover, RETRYABLE
+from metrics import MetricsRegistry
+from shared_ring import SharedRing
+from response_cache import CachedResponse, ResponseCache, RESPONSE_CACHE_BYTES, merge_stats
+from routing import Router, ROUTING_MODES
+
+BOUNDED_LOAD_EPSILON = os.getenv("BOUNDED_LOAD_EPSILON")  # unset → plain ring lookups
+LOAD_SOURCE = os.getenv("LOAD_SOURCE", "inflight")  # "inflight" or "rate"
+LOAD_RATE_WINDOW = float(os.getenv("LOAD_RATE_WINDOW", "1"))
+HASH_FUNCTION = os.getenv("HASH_FUNCTION", "blake2b")  # blake2b, fnv1a, sha256 or lab
+PLACEMENT = os.getenv("PLACEMENT", "ring")  # ring, jump or maglev
+HEALTH_RESPAWN = os.getenv("HEALTH_RESPAWN", "0") == "1"
+LB_WORKERS = int(os.getenv("LB_WORKERS", "1"))  # processes sharing port 6000
+LB_STATS_INTERVAL = float(os.getenv("LB_STATS_INTERVAL", "1"))  # seconds between worker stats publishes
+STATS_BYTES = 1024 * 1024
+PROXY_MODE = os.getenv("PROXY_MODE", "passthrough")  # passthrough or envelope
+ROUTING_MODE = os.getenv("ROUTING_MODE", "ring")  # ring, least_outstanding, p2c or ewma
 
 app = Flask(__name__)
-ch = ConsistentHash()
-servers = {}  # container_id → hostname
+loads = LoadTracker(LOAD_SOURCE, LOAD_RATE_WINDOW)  # hostname → live load
+ch = ConsistentHash(
+    epsilon=float(BOUNDED_LOAD_EPSILON) if BOUNDED_LOAD_EPSILON else None,
+    loads=loads,
+    hash_function=HASH_FUNCTION,
+    placement=PLACEMENT
+)
+router = Router(ch, loads, ROUTING_MODE)  # ring or load-aware backend choice
+servers = EndpointRegistry()  # container_id ↔ hostname, host ports
+pools = PoolManager()  # hostname → keep-alive upstream connections
+failover = Failover()  # retries / hedges along the ring
+cache = ResponseCache() if RESPONSE_CACHE_BYTES > 0 else None  # (id, ring version) → ring-mode response
+
+metrics = MetricsRegistry()
+requests_total = metrics.counter("lb_requests_total", "Requests forwarded to each backend", ("backend",))
+errors_total = metrics.counter("lb_errors_total", "Forwards that failed with a connection error", ("backend",))
+timeouts_total = metrics.counter("lb_timeouts_total", "Forwards that timed out", ("backend",))
+pool_exhausted_total = metrics.counter(
+    "lb_pool_exhausted_total", "Forwards refused because every pooled connection to the backend was busy",
+    ("backend",)
+)
+phase_seconds = metrics.histogram(
+    "lb_phase_seconds", "Time spent in ring lookup, endpoint resolution and upstream forward",
+    ("backend", "phase")
+)
+metrics.gauge("lb_in_flight", "Requests currently being forwarded",
+              lambda: {(s,): n for s, n in loads.in_flight.copy().items()}, ("backend",), summed=True)
+metrics.gauge("lb_ring_servers", "Servers in the ring", lambda: {(): len(ch)})
+metrics.gauge("lb_ring_virtual_nodes", "Virtual nodes on the ring", lambda: {(): len(ch.servers)})
+metrics.gauge("lb_ring_ownership_share", "Share of the hash space owned by each server",
+              lambda: {(s,): share for s, share in ch.ownership().items()}, ("backend",))
+if cache is not None:
+    cache_lookups_total = metrics.counter(
+        "lb_cache_lookups_total", "Response cache lookups by outcome (hit, miss, coalesced)", ("outcome",)
+    )
+    metrics.gauge("lb_cache_entries", "Responses held in the cache", lambda: {(): len(cache)}, summed=True)
+    metrics.gauge("lb_cache_bytes", "Approximate size of the cached responses", lambda: {(): cache.bytes},
+                  summed=True)
+
+shared = None  # SharedRing when running LB_WORKERS > 1 processes
+worker_stats = []  # per worker: SharedRing of its metrics (and, for worker 0, health)
+worker_index = 0
+_synced_version = 0
+_sync_lock = threading.Lock()
+
+def sync_from_shared():
+    """Adopts the latest ring and endpoint table published by any worker.
+
+    Costs one read of the shared version number when nothing has changed.
+    """
+    global _synced_version
+    if shared is None or shared.version == _synced_version:
+        return
+    with _sync_lock:
+        version, state = shared.read()
+        if version == _synced_version or state is None:
+            return
+        ch.restore(state["ring"])
+        servers.restore(state["endpoints"])
+        for name, (cid, port) in state["endpoints"].items():
+            if port:
+                pools.pool_for(name, servers.host, port)
+        for name in pools.names():
+            if name not in state["endpoints"]:
+                pools.drain(name)
+                loads.forget(name)
+                metrics.forget(name)
+        _synced_version = version
+
+@contextmanager
+def cluster_update():
+    """Applies a ring or endpoint change and publishes it to the other workers."""
+    global _synced_version
+    if shared is None:
+        yield
+        return
+    with shared.lock:
+        sync_from_shared()
+        yield
+        shared.publish({"ring": ch.snapshot(), "endpoints": servers.snapshot()})
+        _synced_version = shared.version
+
+def start_server(name, server_id):
+    """Starts a server container and puts it in the ring once its /heartbeat answers.
+
+    Returns the container id, or None if it failed to start or become ready.
+    """
+    container_id = provisioner.run_container(name, server_id)
+    if not container_id:
+        return None
+
+    # Resolve the port without registering: a pending container must not
+    # reach the shared endpoint table, where other workers would route to
+    # it, list it in /rep or pick it for /rm before it is ready
+    host = servers.host
+    port = servers.resolve_port(container_id)
+    if not port:
+        port = servers.resolve_port(container_id)
+
+    if not provisioner.wait_ready(host, port):
+        provisioner.stop_container(name)
+        return None
+
+    with cluster_update():
+        servers.register(container_id, name, port)
+        pools.create(name, host, port)
+        ch.add_server(name)
+    return container_id
+
+def stop_server(name):
+    """Takes a server out of the ring, lets in-flight requests drain, then stops it.
+
+    With several workers it waits for every worker's in-flight requests,
+    as published by publish_stats().
+    """
+    health.remove(name)
+    removed_at = _synced_version
+    if cache is not None:
+        cache.invalidate_server(name)
+    provisioner.wait_drained(lambda: in_flight_everywhere(name, removed_at))
+    with cluster_update():
+        # Health checks on worker 0 may have re-admitted it meanwhile
+        ch.remove_server(name)
+        servers.unregister(name)
+    pools.drain(name)
+    loads.forget(name)
+    metrics.forget(name)
+    provisioner.stop_container(name)
+
+def respawn_server(name):
+    """Replaces an evicted server with a fresh container to keep N constant."""
+    stop_server(name)
+    start_server(f"server-{uuid.uuid4().hex[:6]}", len(servers) + 1)
+
+health = HealthChecker(ch, servers, respawn=respawn_server if HEALTH_RESPAWN else None,
+                       update=cluster_update, on_evict=cache.invalidate_server if cache is not None else None)
+
+@app.before_request
+def adopt_shared_ring():
+    try:
+        sync_from_shared()
+    except TimeoutError:
+        # A writer died mid-publish; keep routing on the ring we have
+        traceback.print_exc()
+
+def publish_stats():
+    """Publishes this worker's metrics (and health, from worker 0) for the others.
+
+    Each worker also syncs the ring first, so the published in-flight
+    counts show whether it still forwards to a server another worker is
+    draining.
+    """
+    slot = worker_stats[worker_index]
+    while True:
+        try:
+            sync_from_shared()
+        except TimeoutError:
+            traceback.print_exc()
+        state = {
+            "version": _synced_version,
+            "in_flight": loads.in_flight.copy(),
+            "metrics": metrics.export()
+        }
+        if cache is not None:
+            state["cache"] = cache.stats()
+        if worker_index == 0:
+            state["health"] = health.snapshot()
+        with slot.lock:
+            slot.publish(state)
+        time.sleep(LB_STATS_INTERVAL)
+
+def peer_stats():
+    """The other workers' last published stats (at most LB_STATS_INTERVAL old)."""
+    peers = []
+    for i, slot in enumerate(worker_stats):
+        if i == worker_index:
+            continue
+        try:
+            _, state = slot.read()
+        except TimeoutError:
+            continue
+        if state is not None:
+            peers.append((i, state))
+    return peers
+
+def in_flight_everywhere(name, version):
+    """Forwards to `name` in flight on any worker.
+
+    Returns None while some worker has not yet published stats from ring
+    version `version` or later, since it might still route to `name`.
+    """
+    total = loads.in_flight.get(name, 0)
+    for _, state in peer_stats():
+        if state["version"] < version:
+            return None
+        total += state["in_flight"].get(name, 0)
+    return total
+
+def replica_state():
+    # With several workers only worker 0 runs the health checker, and each
+    # worker has its own cache; read the others' published stats
+    peers = dict(peer_stats())
+    state = {
+        "N": len(servers),
+        "replicas": servers.names(),
+        "health": health.snapshot() if worker_index == 0 else peers.get(0, {}).get("health", {})
+    }
+    if cache is not None:
+        state["cache"] = merge_stats([cache.stats()] + [p["cache"] for p in peers.values() if "cache" in p])
+    return state
 
 @app.route('/rep', methods=['GET'])
 def replicas():
     return jsonify({
-        "message": {
-            "N": len(servers),
-            "replicas": list(servers.values())
-        },
+        "message": replica_state(),
         "status": "successful"
     }), 200
 
@@ -36,24 +268,15 @@ def add_servers():
             "status": "failure"
         }), 400
 
-    added = []
-
-    for i in range(n):
-        name = hostnames[i] if i < len(hostnames) else f"server-{uuid.uuid4().hex[:6]}"
-        cmd = f"docker run -d --rm --name {name} -e SERVER_ID={i+1} -p 0:5000 simple-server"
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE)
-        container_id = result.stdout.decode().strip()
-
-        if container_id:
-            servers[container_id] = name
-            ch.add_server(name)
-            added.append(name)
+    names = [
+        hostnames[i] if i < len(hostnames) else f"server-{uuid.uuid4().hex[:6]}"
+        for i in range(n)
+    ]
+    # Launch all containers at once; each joins the ring as soon as it is ready
+    provisioner.run_parallel(lambda i: start_server(names[i], i + 1), range(n))
 
     return jsonify({
-        "message": {
-            "N": len(servers),
-            "replicas": list(servers.values())
-        },
+        "message": replica_state(),
         "status": "successful"
     }), 200
 
@@ -69,64 +292,163 @@ def remove_servers():
             "status": "failure"
         }), 400
 
-    removed = []
-
     if hostnames:
-        for h in hostnames:
-            cid = next((k for k, v in servers.items() if v == h), None)
-            if cid:
-                subprocess.run(f"docker stop {h}", shell=True)
-                ch.remove_server(h)
-                removed.append(servers.pop(cid))
+        to_remove = [h for h in hostnames if servers.container_id(h)]
     else:
-        to_remove = list(servers.items())[:n]
-        for cid, h in to_remove:
-            subprocess.run(f"docker stop {h}", shell=True)
-            ch.remove_server(h)
-            removed.append(servers.pop(cid))
+        to_remove = [h for _, h in servers.items()[:n]]
+
+    provisioner.run_parallel(stop_server, to_remove)
 
     return jsonify({
-        "message": {
-            "N": len(servers),
-            "replicas": list(servers.values())
-        },
+        "message": replica_state(),
         "status": "successful"
     }), 200
 
+class BackendUnavailable(ConnectionError):
+    pass
+
+def forward(server, cancel=None):
+    """Forwards /home to one server; returns (container_id, UpstreamResponse).
+
+    Returns once the status line and headers have arrived. The server stays
+    counted as in flight until release() is called for it, after the body
+    has been relayed. `cancel` lets a winning hedge abort the wait.
+    """
+    requests_total.inc(server)
+    start = time.perf_counter()
+    try:
+        # Find container ID and port in the endpoint table
+        endpoint = servers.endpoint(server)
+        if not endpoint:
+            raise BackendUnavailable(f"Target container {server} not found")
+
+        cid, host, port = endpoint
+        if not port:
+            raise BackendUnavailable(f"Target container {server} is not running")
+
+        pool = pools.get(server, host, port)
+        if pool is None:
+            raise BackendUnavailable(f"Target container {server} is being removed")
+        resolved = time.perf_counter()
+        phase_seconds.observe(resolved - start, server, "resolve")
+
+        loads.start(server)
+        try:
+            upstream = pool.open("GET", "/home", cancel=cancel)
+        except BaseException as e:
+            loads.finish(server)
+            if isinstance(e, RETRYABLE) and (cancel is None or not cancel.cancelled):
+                # A failure counts as a sample no faster than the timeout, so
+                # ewma routing backs off a dead backend instead of favouring
+                # it for refusing connections quickly
+                loads.record_latency(server, max(time.perf_counter() - resolved, pool.timeout))
+            raise
+        elapsed = time.perf_counter() - resolved
+        phase_seconds.observe(elapsed, server, "forward")
+        loads.record_latency(server, elapsed)
+        return cid, upstream
+
+    except PoolExhausted:
+        pool_exhausted_total.inc(server)
+        raise
+    except TimeoutError:
+        timeouts_total.inc(server)
+        raise
+    except RETRYABLE:
+        if cancel is None or not cancel.cancelled:
+            errors_total.inc(server)
+        raise
+
+def release(server, result):
+    """Closes a forward's upstream response and stops counting it as in flight."""
+    _, upstream = result
+    upstream.close()
+    loads.finish(server)
+
+def fetch(req_id, target_server):
+    """Forwards with failover and reads the whole body into a CachedResponse."""
+    handled_by, (cid, upstream) = failover.call(
+        failover_order(req_id, target_server), forward, discard=release
+    )
+    try:
+        body = upstream.read()
+    finally:
+        release(handled_by, (cid, upstream))
+    return CachedResponse(handled_by, cid, upstream.status, upstream.headers, body)
+
+def relay_headers(headers, server, container_id):
+    return relayable_headers(headers) + [("X-Forwarded-To", server), ("X-Container-Id", container_id)]
+
+def failover_order(req_id, target_server):
+    """The chosen server first, then the other servers in ring order."""
+    yield target_server
+    rest = ch.iter_servers(req_id) if req_id is not None else ch.round_robin_order
+    for server in rest:
+        if server != target_server:
+            yield server
+
 @app.route('/home', methods=['GET'])
 def route_request():
-    req_id = request.args.get("id", "")
-    target_server = ch.get_server(req_id)
-
-    if not target_server:
+    req_id = request.args.get("id")
+    mode = request.args.get("mode", router.mode)
+    if mode not in ROUTING_MODES:
         return jsonify({
-            "message": "<Error> No server found to handle this request",
+            "message": f"<Error> Unknown routing mode '{mode}'",
             "status": "failure"
         }), 400
 
-    # Find container ID and get port
-    cid = next((k for k, v in servers.items() if v == target_server), None)
-    if not cid:
+    start = time.perf_counter()
+    target_server = router.get_server(req_id, mode)
+    if target_server:
+        phase_seconds.observe(time.perf_counter() - start, target_server, "lookup")
+
+    if not target_server:
         return jsonify({
-            "message": "<Error> Target container not found",
+            "message": "<Error> No server found to handle this request",
             "status": "failure"
-        }), 404
+        }), 400
 
+    # Load-aware modes have no key affinity, so failover walks the plain order
+    ring_id = req_id if mode == "ring" else None
     try:
-        inspect_cmd = [
-            "docker", "inspect", cid,
-            "--format", "{{(index (index .NetworkSettings.Ports \"5000/tcp\") 0).HostPort}}"
-        ]
-        port = subprocess.check_output(inspect_cmd).decode().strip()
+        if cache is not None and ring_id is not None:
+            # Only ring mode maps an id to a fixed server; the ring version in
+            # the key retires entries whenever that mapping changes
+            res, outcome = cache.get((req_id, ch.version), lambda: fetch(ring_id, target_server))
+            cache_lookups_total.inc(outcome)
+        elif PROXY_MODE == "envelope":
+            res = fetch(ring_id, target_server)
+        else:
+            handled_by, (cid, upstream) = failover.call(
+                failover_order(ring_id, target_server), forward, discard=release
+            )
+            # Stream the body through undecoded; release once the client has it
+            response = Response(upstream.chunks(), status=upstream.status,
+                                headers=relay_headers(upstream.headers, handled_by, cid))
+            response.call_on_close(lambda: release(handled_by, (cid, upstream)))
+            return response
 
-        import requests
-        res = requests.get(f"http://localhost:{port}/home", timeout=2)
+        if PROXY_MODE == "envelope":
+            return jsonify({
+                "forwarded_to": res.server,
+                "handled_by_container": res.container_id,
+                "container_response": json.loads(res.body)
+            }), 200
+        return Response(res.body, status=res.status, headers=relay_headers(res.headers, res.server, res.container_id))
 
+    except PoolExhausted as e:
+        # The load balancer itself is out of connections; not the backend's fault
         return jsonify({
-            "forwarded_to": target_server,
-            "handled_by_container": cid,
-            "container_response": res.json()
-        }), 200
+            "message": f"<Error> {str(e)}",
+            "status": "failure"
+        }), 503
+
+    except RETRYABLE as e:
+        # Every permitted replica was missing, refused, reset or timed out
+        return jsonify({
+            "message": f"<Error> {str(e)}",
+            "status": "failure"
+        }), 503
 
     except Exception as e:
         traceback.print_exc()
@@ -135,5 +457,50 @@ def route_request():
             "status": "failure"
         }), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    peers = [state["metrics"] for _, state in peer_stats()]
+    return Response(metrics.render(peers), mimetype="text/plain; version=0.0.4")
+
+def serve_workers(n, host="0.0.0.0", port=6000):
+    """Forks n worker processes accepting on one listening socket.
+
+    The workers route off a SharedRing; worker 0 also runs the health
+    checker and follows docker events.
+    """
+    global shared, worker_stats, worker_index
+    shared = SharedRing()
+    with shared.lock:
+        shared.publish({"ring": ch.snapshot(), "endpoints": servers.snapshot()})
+    worker_stats = [SharedRing(STATS_BYTES) for _ in range(n)]
+
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.set_inheritable(True)
+    children = []
+    for worker in range(n):
+        pid = os.fork()
+        if pid == 0:
+            worker_index = worker
+            threading.Thread(target=publish_stats, daemon=True).start()
+            if worker == 0:
+                servers.watch_events(update=cluster_update)
+                health.start()
+            make_server(host, port, app, threaded=True, fd=sock.fileno()).serve_forever()
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in children:
+        os.wait()
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=6000)
+    if LB_WORKERS > 1:
+        serve_workers(LB_WORKERS)
+    else:
+        servers.watch_events()
+        health.start()
+        app.run(host="0.0.0.0", port=6000)
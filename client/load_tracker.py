@@ -0,0 +1,87 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+class LoadTracker:
+    """Live per-server load, fed by the forwarding path.
+
+    `source` selects what load() reports: "inflight" counts requests
+    currently being forwarded to a server, "rate" is an exponentially
+    decayed count of recent requests (time constant `window` seconds).
+    `latency_ewma` holds an exponentially weighted average of each
+    server's forward latency (weight `latency_alpha` per sample).
+    """
+
+    def __init__(self, source="inflight", window=1.0, latency_alpha=0.2):
+        if source not in ("inflight", "rate"):
+            raise ValueError(f"Unknown load source '{source}'")
+        self.source = source
+        self.window = window
+        self.latency_alpha = latency_alpha
+        self.in_flight = {}  # server_name → requests being forwarded
+        self.latency_ewma = {}  # server_name → average forward latency (s)
+        self._in_flight_total = 0
+        self._rates = {}  # server_name → (decayed count, last update)
+        self._rate_total = (0.0, time.monotonic())
+        self._lock = threading.Lock()
+
+    def start(self, server):
+        with self._lock:
+            self.in_flight[server] = self.in_flight.get(server, 0) + 1
+            self._in_flight_total += 1
+            if self.source == "rate":
+                now = time.monotonic()
+                self._rates[server] = (self._decayed(self._rates.get(server), now) + 1, now)
+                self._rate_total = (self._decayed(self._rate_total, now) + 1, now)
+
+    def finish(self, server):
+        with self._lock:
+            count = self.in_flight.get(server, 0)
+            if count:
+                self.in_flight[server] = count - 1
+                self._in_flight_total -= 1
+
+    def record_latency(self, server, seconds):
+        with self._lock:
+            average = self.latency_ewma.get(server)
+            if average is None:
+                self.latency_ewma[server] = seconds
+            else:
+                self.latency_ewma[server] = average + self.latency_alpha * (seconds - average)
+
+    @contextmanager
+    def track(self, server):
+        """Counts a forward to `server` for as long as the block runs."""
+        self.start(server)
+        try:
+            yield
+        finally:
+            self.finish(server)
+
+    def load(self, server):
+        if self.source == "inflight":
+            return self.in_flight.get(server, 0)
+        return self._decayed(self._rates.get(server), time.monotonic())
+
+    def total(self):
+        if self.source == "inflight":
+            return self._in_flight_total
+        return self._decayed(self._rate_total, time.monotonic())
+
+    def forget(self, server):
+        """Drops a server's counters once it has left the ring."""
+        with self._lock:
+            self._in_flight_total -= self.in_flight.pop(server, 0)
+            self.latency_ewma.pop(server, None)
+            rate = self._rates.pop(server, None)
+            if rate is not None:
+                now = time.monotonic()
+                total = self._decayed(self._rate_total, now) - self._decayed(rate, now)
+                self._rate_total = (max(total, 0.0), now)
+
+    def _decayed(self, entry, now):
+        if entry is None:
+            return 0.0
+        value, updated = entry
+        return value * math.exp((updated - now) / self.window)
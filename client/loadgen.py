@@ -0,0 +1,222 @@
+"""Open-loop load generator for the load balancer.
+
+Sends GET /home?id=... at a fixed target rate for a fixed duration. Send
+times follow a precomputed schedule that does not wait for earlier
+responses, and each latency is measured from the time the request was
+*scheduled* to be sent, so stalls in the load balancer (or in this
+generator) show up in the percentiles instead of silently lowering the
+offered load (coordinated omission).
+
+Reports throughput, error rate and p50/p90/p99/p999 latency per backend
+(from the X-Forwarded-To header, or `forwarded_to` in envelope mode). A
+timeline of /add and /rm calls can run alongside; results are then also
+split into phases between those changes.
+
+Example:
+    python client/loadgen.py --rate 500 --duration 30 --dist zipf \\
+        --at 10:add:2 --at 20:rm:1:server-a
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import aiohttp
+
+from bench_ring import ids_from_jsonl, percentile, uniform_ids, zipf_ids
+
+LB_URL = "http://localhost:6000"
+QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999))
+
+def schedule(rate, duration, arrivals="uniform", seed=0):
+    """Returns the send offsets (seconds from start) for `rate` requests/s."""
+    if arrivals == "poisson":
+        rng = random.Random(seed)
+        offsets, t = [], rng.expovariate(rate)
+        while t < duration:
+            offsets.append(t)
+            t += rng.expovariate(rate)
+        return offsets
+    return [i / rate for i in range(int(rate * duration))]
+
+def parse_action(value):
+    """Parses SECONDS:add|rm:N[:host,host] into a timeline entry."""
+    parts = value.split(":")
+    if len(parts) not in (3, 4) or parts[1] not in ("add", "rm"):
+        raise argparse.ArgumentTypeError(f"expected SECONDS:add|rm:N[:hostnames], got '{value}'")
+    hostnames = [h for h in parts[3].split(",") if h] if len(parts) == 4 else []
+    return {"at": float(parts[0]), "action": parts[1], "n": int(parts[2]), "hostnames": hostnames}
+
+async def change_cluster(session, base_url, action, n, hostnames=()):
+    """Calls /add or /rm and returns the load balancer's JSON reply."""
+    method, path = ("POST", "/add") if action == "add" else ("DELETE", "/rm")
+    async with session.request(method, base_url + path, json={"n": n, "hostnames": list(hostnames)}) as res:
+        return await res.json(content_type=None)
+
+async def wait_for_replicas(session, base_url, n=1, timeout=30.0):
+    """Polls /rep until at least n replicas are in the ring."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(base_url + "/rep") as res:
+                state = (await res.json(content_type=None))["message"]
+            if state["N"] >= n:
+                return state
+        except (aiohttp.ClientError, KeyError, ValueError):
+            pass
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Fewer than {n} replicas after {timeout}s")
+        await asyncio.sleep(0.2)
+
+class Sample:
+    __slots__ = ("intended", "latency", "backend", "ok")
+
+    def __init__(self, intended, latency, backend, ok):
+        self.intended = intended
+        self.latency = latency
+        self.backend = backend
+        self.ok = ok
+
+async def send(session, url, intended, start, samples):
+    """Sends one request; its latency counts from `start + intended`."""
+    backend, ok = None, False
+    try:
+        async with session.get(url) as res:
+            body = await res.read()
+            ok = res.status == 200
+            backend = res.headers.get("X-Forwarded-To")
+            if backend is None and ok:
+                backend = json.loads(body).get("forwarded_to")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        pass
+    samples.append(Sample(intended, time.perf_counter() - start - intended, backend or "-", ok))
+
+async def run_timeline(session, base_url, timeline, start, events):
+    for entry in sorted(timeline, key=lambda e: e["at"]):
+        await asyncio.sleep(max(0.0, start + entry["at"] - time.perf_counter()))
+        began = time.perf_counter() - start
+        try:
+            reply = await change_cluster(session, base_url, entry["action"], entry["n"], entry["hostnames"])
+            replicas = reply.get("message", {}).get("replicas")
+        except (aiohttp.ClientError, ValueError) as e:
+            replicas = f"<Error> {e}"
+        events.append(dict(entry, started=began, took=time.perf_counter() - start - began, replicas=replicas))
+
+async def run(base_url, request_ids, offsets, timeline=(), connections=256, timeout=10.0):
+    """Drives /home on the `offsets` schedule; returns (samples, timeline events)."""
+    samples, events, pending = [], [], set()
+    connector = aiohttp.TCPConnector(limit=connections)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        start = time.perf_counter()
+        control = asyncio.create_task(run_timeline(session, base_url, timeline, start, events))
+        for i, offset in enumerate(offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            url = f"{base_url}/home?id={request_ids[i % len(request_ids)]}"
+            task = asyncio.create_task(send(session, url, offset, start, samples))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+        await control
+    return samples, events
+
+def summarize(samples, seconds):
+    """Throughput, error rate and latency percentiles for a set of samples."""
+    ordered = sorted(s.latency for s in samples)
+    errors = sum(1 for s in samples if not s.ok)
+    summary = {
+        "requests": len(samples),
+        "throughput": (len(samples) - errors) / seconds if seconds else 0.0,
+        "error_rate": errors / len(samples) if samples else 0.0,
+    }
+    for label, q in QUANTILES:
+        summary[label] = percentile(ordered, q)
+    return summary
+
+def report(samples, events, duration):
+    """Splits samples into phases at each timeline change and summarizes them."""
+    changes = sorted(min(e["started"], duration) for e in events)
+    bounds = [0.0] + changes + [duration]
+    phases = []
+    for lo, hi in zip(bounds, bounds[1:]):
+        in_phase = [s for s in samples if lo <= s.intended < hi]
+        if not in_phase:
+            continue
+        by_backend = {}
+        for s in in_phase:
+            by_backend.setdefault(s.backend, []).append(s)
+        phases.append({
+            "from": lo,
+            "to": hi,
+            "all": summarize(in_phase, hi - lo),
+            "backends": {b: summarize(group, hi - lo) for b, group in sorted(by_backend.items())},
+        })
+    return {"overall": summarize(samples, duration), "events": events, "phases": phases}
+
+def ms(value):
+    return f"{value * 1000:>9.1f}" if value is not None else f"{'-':>9}"
+
+def format_summary(label, s):
+    return (
+        f"{label:<16} {s['requests']:>8} {s['throughput']:>9.1f} {s['error_rate'] * 100:>6.2f}%"
+        + "".join(ms(s[q]) for q, _ in QUANTILES)
+    )
+
+def print_table(result):
+    header = f"{'backend':<16} {'requests':>8} {'ok/s':>9} {'errors':>7}" + "".join(f"{q + ' ms':>9}" for q, _ in QUANTILES)
+    for event in result["events"]:
+        print(f"t={event['started']:.1f}s {event['action']} {event['n']} {event['hostnames'] or ''}"
+              f" took {event['took']:.2f}s → {event['replicas']}")
+    for phase in result["phases"]:
+        print(f"\n[{phase['from']:.1f}s – {phase['to']:.1f}s]")
+        print(header)
+        for backend, s in phase["backends"].items():
+            print(format_summary(backend, s))
+        print(format_summary("all", phase["all"]))
+    print()
+    print(format_summary("overall", result["overall"]))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=LB_URL, help="load balancer base URL")
+    parser.add_argument("--rate", type=float, default=200, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--arrivals", choices=["uniform", "poisson"], default="uniform")
+    parser.add_argument("--ids", help="JSON-lines file of request ids (e.g. requests.jsonl)")
+    parser.add_argument("--dist", choices=["uniform", "zipf"], default="uniform")
+    parser.add_argument("--universe", type=int, default=100000, help="distinct synthetic ids")
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--connections", type=int, default=256, help="max open connections")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout in seconds")
+    parser.add_argument("--at", dest="timeline", type=parse_action, action="append", default=[],
+                        metavar="SECONDS:add|rm:N[:hostnames]", help="cluster change during the run")
+    parser.add_argument("--format", choices=["table", "json"], default="table")
+    args = parser.parse_args(argv)
+
+    offsets = schedule(args.rate, args.duration, args.arrivals, args.seed)
+    if not offsets:
+        parser.error("--rate x --duration schedules no requests")
+    if args.ids:
+        request_ids = ids_from_jsonl(args.ids)
+    elif args.dist == "zipf":
+        request_ids = zipf_ids(len(offsets), args.universe, args.zipf_s, args.seed)
+    else:
+        request_ids = uniform_ids(len(offsets), args.universe, args.seed)
+
+    samples, events = asyncio.run(
+        run(args.url, request_ids, offsets, args.timeline, args.connections, args.timeout)
+    )
+    result = report(samples, events, args.duration)
+    if args.format == "json":
+        print(json.dumps(result))
+    else:
+        print_table(result)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds in seconds, from ring lookups (µs) up to upstream timeouts (s)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{v}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values = {}  # label values → count
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def forget(self, *labels):
+        """Drops every label set starting with `labels`."""
+        with self._lock:
+            for key in [k for k in self._values if k[:len(labels)] == labels]:
+                del self._values[key]
+
+    def export(self):
+        """Returns [[label values, count], ...] for merging in another process."""
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def render(self, peers=()):
+        """`peers` holds export() results from other processes to add in."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            merged = dict(self._values)
+        for exported in peers:
+            for labels, value in exported:
+                labels = tuple(labels)
+                merged[labels] = merged.get(labels, 0) + value
+        for labels, value in sorted(merged.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+class Gauge:
+    """A gauge read from `collect()` at scrape time, so nothing runs per request.
+
+    `collect` returns {label values tuple: value}. A `summed` gauge counts
+    something per process (like in-flight requests) and is added up across
+    processes; other gauges describe shared state and are reported as seen
+    by the process answering the scrape.
+    """
+
+    def __init__(self, name, help, collect, label_names=(), summed=False):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.label_names = label_names
+        self.summed = summed
+
+    def export(self):
+        if not self.summed:
+            return None
+        return [[list(labels), value] for labels, value in self.collect().items()]
+
+    def render(self, peers=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = dict(self.collect())
+        for exported in peers if self.summed else ():
+            for labels, value in exported:
+                labels = tuple(labels)
+                values[labels] = values.get(labels, 0) + value
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum", "lock")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+class Histogram:
+    """Fixed-bucket histogram; each label set has preallocated bucket counts
+    and its own lock, so observing is a bisect plus two increments.
+    """
+
+    def __init__(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._children = {}  # label values → _HistogramChild
+        self._lock = threading.Lock()
+
+    def _child(self, labels):
+        child = self._children.get(labels)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labels, _HistogramChild(len(self.buckets) + 1))
+        return child
+
+    def observe(self, value, *labels):
+        child = self._child(labels)
+        idx = bisect_left(self.buckets, value)
+        with child.lock:
+            child.counts[idx] += 1
+            child.sum += value
+
+    def forget(self, *labels):
+        """Drops every label set starting with `labels`."""
+        with self._lock:
+            for key in [k for k in self._children if k[:len(labels)] == labels]:
+                del self._children[key]
+
+    def _values(self):
+        with self._lock:
+            children = list(self._children.items())
+        values = {}
+        for labels, child in children:
+            with child.lock:
+                values[labels] = (list(child.counts), child.sum)
+        return values
+
+    def export(self):
+        """Returns [[label values, bucket counts, sum], ...]."""
+        return [[list(labels), counts, total] for labels, (counts, total) in self._values().items()]
+
+    def render(self, peers=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = self.buckets + (float("inf"),)
+        merged = self._values()
+        for exported in peers:
+            for labels, counts, total in exported:
+                labels = tuple(labels)
+                mine = merged.get(labels)
+                if mine is None:
+                    merged[labels] = (counts, total)
+                else:
+                    merged[labels] = ([a + b for a, b in zip(mine[0], counts)], mine[1] + total)
+        for labels, (counts, total) in sorted(merged.items()):
+            names = self.label_names + ("le",)
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            label_str = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_str} {total!r}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, label_names=()):
+        return self.register(Counter(name, help, label_names))
+
+    def gauge(self, name, help, collect, label_names=(), summed=False):
+        return self.register(Gauge(name, help, collect, label_names, summed))
+
+    def histogram(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, label_names, buckets))
+
+    def forget(self, *labels):
+        """Drops label sets starting with `labels` (e.g. a removed backend) everywhere."""
+        for metric in self.metrics:
+            if hasattr(metric, "forget"):
+                metric.forget(*labels)
+
+    def export(self):
+        """Returns this process's values as JSON-serialisable data, for render(peers)."""
+        exported = {}
+        for metric in self.metrics:
+            values = metric.export()
+            if values is not None:
+                exported[metric.name] = values
+        return exported
+
+    def render(self, peers=()):
+        """Returns all metrics in the Prometheus text exposition format.
+
+        `peers` are export() results from other worker processes; their
+        counters, histograms and summed gauges are added to this one's.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render([p[metric.name] for p in peers if metric.name in p]))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from health_check import heartbeat
+
+SERVER_IMAGE = os.getenv("SERVER_IMAGE", "simple-server")
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "30"))
+READY_INTERVAL = float(os.getenv("READY_INTERVAL", "0.2"))
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "10"))
+STOP_TIMEOUT = int(os.getenv("STOP_TIMEOUT", "2"))
+MAX_PARALLEL = int(os.getenv("PROVISION_PARALLEL", "8"))
+
+def run_container(name, server_id):
+    """Starts a server container and returns its id ("" if docker failed)."""
+    result = subprocess.run(
+        ["docker", "run", "-d", "--rm", "--name", name,
+         "-e", f"SERVER_ID={server_id}", "-p", "0:5000", SERVER_IMAGE],
+        stdout=subprocess.PIPE,
+    )
+    return result.stdout.decode().strip()
+
+def stop_container(name, timeout=STOP_TIMEOUT):
+    subprocess.run(["docker", "stop", "-t", str(timeout), name], stdout=subprocess.DEVNULL)
+
+def wait_ready(host, port, timeout=READY_TIMEOUT, interval=READY_INTERVAL):
+    """Polls /heartbeat until it answers 200; returns False after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    while True:
+        if port and heartbeat(host, port, timeout=interval * 5) is None:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+def wait_drained(in_flight, timeout=DRAIN_TIMEOUT, interval=0.05):
+    """Waits until in_flight() returns 0; returns False on timeout.
+
+    in_flight() may return None while the count is not known yet.
+    """
+    deadline = time.monotonic() + timeout
+    while in_flight() != 0:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+def run_parallel(fn, items):
+    """Applies fn to every item concurrently and returns the results in order."""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(items), MAX_PARALLEL)) as pool:
+        return list(pool.map(fn, items))
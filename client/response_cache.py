@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", "0"))  # 0 → no cache
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "5"))
+
+class CachedResponse:
+    """A fully read upstream response and the server that produced it."""
+    __slots__ = ("server", "container_id", "status", "headers", "body", "expires", "size")
+
+    def __init__(self, server, container_id, status, headers, body, expires=0.0):
+        self.server = server
+        self.container_id = container_id
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires = expires
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers)
+
+class _Flight:
+    """An upstream call in progress that other misses for the key wait on."""
+    __slots__ = ("done", "response", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+class ResponseCache:
+    """LRU cache of upstream responses with a byte budget and a TTL.
+
+    Only 200 responses are stored. Concurrent misses for one key are
+    coalesced: the first caller loads it, the others wait for its result
+    (or its exception). Entries are indexed by the server that produced
+    them so a server's entries can be dropped when it leaves the ring.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES, ttl=RESPONSE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key → CachedResponse, least recently used first
+        self._by_server = {}  # hostname → {keys}
+        self._flights = {}  # key → _Flight
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        """Returns (CachedResponse, outcome) for key, calling load() on a miss.
+
+        `outcome` is "hit", "miss" or "coalesced". load() returns a
+        CachedResponse.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry, "hit"
+                self._drop(key)
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response, "coalesced"
+
+        try:
+            flight.response = load()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.response is not None and flight.response.status == 200:
+                    self._store(key, flight.response)
+            flight.done.set()
+        return flight.response, "miss"
+
+    def _store(self, key, response):
+        if response.size > self.max_bytes:
+            return
+        response.expires = time.monotonic() + self.ttl
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = response
+        self._by_server.setdefault(response.server, set()).add(key)
+        self.bytes += response.size
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        keys = self._by_server.get(entry.server)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_server[entry.server]
+
+    def invalidate_server(self, server):
+        """Drops every entry produced by `server`."""
+        with self._lock:
+            for key in list(self._by_server.get(server, ())):
+                self._drop(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+def merge_stats(stats):
+    """Adds up stats() of several caches, e.g. one per worker process."""
+    merged = {key: sum(s[key] for s in stats)
+              for key in ("entries", "bytes", "hits", "misses", "coalesced", "evictions")}
+    lookups = merged["hits"] + merged["misses"] + merged["coalesced"]
+    merged["hit_rate"] = (merged["hits"] + merged["coalesced"]) / lookups if lookups else 0.0
+    return merged
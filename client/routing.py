@@ -0,0 +1,56 @@
+import itertools
+import random
+
+ROUTING_MODES = ("ring", "least_outstanding", "p2c", "ewma")
+
+class Router:
+    """Picks the backend for a request.
+
+    "ring" keeps key affinity and defers to ConsistentHash.get_server. The
+    other modes ignore the request id and pick from the servers in the
+    ring by live load from the LoadTracker:
+
+    - least_outstanding: fewest requests in flight
+    - p2c: the less loaded of two servers drawn at random
+    - ewma: lowest EWMA forward latency × (in-flight + 1)
+
+    Ties are broken by a rotating start point so equally loaded servers
+    share traffic round-robin.
+    """
+
+    def __init__(self, ring, loads, mode="ring", seed=None):
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode '{mode}'")
+        self.ring = ring
+        self.loads = loads
+        self.mode = mode
+        self._rng = random.Random(seed)
+        self._turn = itertools.count()
+
+    def get_server(self, request_id=None, mode=None):
+        """Returns the server for a request under `mode` (default: the router's)."""
+        mode = mode or self.mode
+        if mode == "ring":
+            return self.ring.get_server(request_id)
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode '{mode}'")
+
+        order = self.ring.round_robin_order
+        if not order:
+            return None
+        in_flight = self.loads.in_flight
+        if mode == "p2c":
+            if len(order) == 1:
+                return order[0]
+            a, b = self._rng.sample(order, 2)
+            return a if in_flight.get(a, 0) <= in_flight.get(b, 0) else b
+
+        start = next(self._turn) % len(order)
+        candidates = order[start:] + order[:start]
+        if mode == "least_outstanding":
+            return min(candidates, key=lambda s: in_flight.get(s, 0))
+        latency = self.loads.latency_ewma.copy()
+        # Servers without a sample yet are priced at the average so a new
+        # server is not flooded before its first response comes back
+        default = sum(latency.values()) / len(latency) if latency else 0.0
+        return min(candidates, key=lambda s: latency.get(s, default) * (in_flight.get(s, 0) + 1))
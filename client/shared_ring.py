@@ -0,0 +1,65 @@
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+
+SHARED_RING_BYTES = int(os.getenv("SHARED_RING_BYTES", str(4 * 1024 * 1024)))
+
+_HEADER = struct.Struct("<QI")  # sequence number, payload length
+
+class SharedRing:
+    """A versioned snapshot of the cluster state in anonymous shared memory.
+
+    Create it before forking the worker processes. Writers take the
+    cross-process lock and publish a new snapshot; readers never lock: the
+    header's sequence number is odd while a write is in progress and is
+    bumped again when it finishes (a seqlock), so a reader retries if the
+    number was odd or changed while it copied the payload.
+    """
+
+    def __init__(self, size=SHARED_RING_BYTES):
+        self.size = size
+        self._buf = mmap.mmap(-1, size, flags=mmap.MAP_SHARED)
+        self.lock = multiprocessing.Lock()
+
+    @property
+    def version(self):
+        """Number of snapshots published so far (0 before the first)."""
+        seq, _ = _HEADER.unpack_from(self._buf, 0)
+        return seq // 2
+
+    def publish(self, state):
+        """Writes `state` (JSON-serialisable) as the next snapshot; hold `lock`."""
+        payload = json.dumps(state, separators=(",", ":")).encode()
+        if _HEADER.size + len(payload) > self.size:
+            raise ValueError(f"Ring snapshot of {len(payload)} bytes exceeds SHARED_RING_BYTES")
+        seq, _ = _HEADER.unpack_from(self._buf, 0)
+        _HEADER.pack_into(self._buf, 0, seq + 1, 0)
+        self._buf[_HEADER.size:_HEADER.size + len(payload)] = payload
+        _HEADER.pack_into(self._buf, 0, seq + 2, len(payload))
+
+    def read(self, timeout=1.0):
+        """Returns (version, state) of the latest complete snapshot.
+
+        Raises TimeoutError if no complete snapshot could be read within
+        `timeout` seconds, e.g. because a writer died mid-publish.
+        """
+        deadline = None
+        while True:
+            seq, length = _HEADER.unpack_from(self._buf, 0)
+            if not seq & 1:
+                payload = self._buf[_HEADER.size:_HEADER.size + length]
+                if _HEADER.unpack_from(self._buf, 0)[0] == seq:
+                    break
+            # Writes take microseconds; back off instead of spinning on a stuck one
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + timeout
+            elif now >= deadline:
+                raise TimeoutError("Shared snapshot is stuck mid-write")
+            time.sleep(0.0001)
+        if not seq:
+            return 0, None
+        return seq // 2, json.loads(payload)
@@ -3,9 +3,11 @@ import aiohttp
 from collections import defaultdict
 import matplotlib.pyplot as plt
 
+from loadgen import wait_for_replicas
+
 NUM_REQUESTS = 10000
 MAX_CONCURRENCY = 100  # at most 100 simultaneous HTTP requests
-LB_URL = "http://localhost:6000/home?id="
+LB_URL = "http://localhost:6000"
 
 async def fetch(sem, session, url):
     # throttle with semaphore
@@ -13,7 +15,7 @@ async def fetch(sem, session, url):
         try:
             async with session.get(url, timeout=10) as response:
                 data = await response.json()
-                server_msg = data.get("container_response", {}).get("message", "")
+                server_msg = data.get("container_response", data).get("message", "")
                 # Extract "Server lbX" → "lbX"
                 return server_msg.split("Server")[-1].strip()
         except:
@@ -24,11 +26,11 @@ async def main():
     sem = asyncio.Semaphore(MAX_CONCURRENCY)
 
     async with aiohttp.ClientSession() as session:
-        print("⏳ Waiting 10 seconds for servers to be ready…")
-        await asyncio.sleep(10)
+        print("⏳ Waiting for servers to be ready…")
+        await wait_for_replicas(session, LB_URL)
 
         tasks = [
-            asyncio.create_task(fetch(sem, session, LB_URL + str(i)))
+            asyncio.create_task(fetch(sem, session, f"{LB_URL}/home?id={i}"))
             for i in range(NUM_REQUESTS)
         ]
 
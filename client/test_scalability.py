@@ -2,22 +2,20 @@ import asyncio
 import aiohttp
 import matplotlib.pyplot as plt
 from collections import defaultdict
-import subprocess
-import time
 
-LB_HOME_URL = "http://localhost:6000/home?id="
-LB_ADD_URL = "http://localhost:6000/add"
-LB_RM_URL = "http://localhost:6000/rm"
+from loadgen import change_cluster
+
+LB_URL = "http://localhost:6000"
+LB_HOME_URL = LB_URL + "/home?id="
 NUM_REQUESTS = 10000
 MAX_CONCURRENCY = 100  # limit concurrent HTTP requests
-STARTUP_DELAY = 10     # seconds to wait after /add
 
 async def fetch(sem, session, url):
     async with sem:
         try:
             async with session.get(url, timeout=10) as response:
                 data = await response.json()
-                msg = data.get("container_response", {}).get("message", "")
+                msg = data.get("container_response", data).get("message", "")
                 return msg.split("Server")[-1].strip()
         except:
             return "error"
@@ -37,35 +35,23 @@ async def send_requests():
 
     return counts
 
-def add_servers(n):
+async def add_servers(session, n):
     hostnames = [f"auto{i}" for i in range(n)]
-    payload = {
-        "n": n,
-        "hostnames": hostnames
-    }
-    subprocess.run([
-        "curl", "-s", "-X", "POST", LB_ADD_URL,
-        "-H", "Content-Type: application/json",
-        "-d", str(payload).replace("'", '"')
-    ])
+    await change_cluster(session, LB_URL, "add", n, hostnames)
 
-def remove_all_servers():
-    subprocess.run([
-        "curl", "-s", "-X", "DELETE", LB_RM_URL,
-        "-H", "Content-Type: application/json",
-        "-d", '{"n": 6}'
-    ])
+async def remove_all_servers(session):
+    await change_cluster(session, LB_URL, "rm", 6)
 
 async def main():
     results = []
 
     for n in range(2, 7):  # N = 2 to 6
         print(f"\n▶️ Testing with {n} servers...")
-        remove_all_servers()
-        time.sleep(2)  # allow removal to propagate
-        add_servers(n)
-        print(f"⏳ Waiting {STARTUP_DELAY}s for {n} servers to boot…")
-        await asyncio.sleep(STARTUP_DELAY)
+        # /rm returns once servers are drained and stopped, /add once the
+        # new servers answer /heartbeat, so no settling delays are needed
+        async with aiohttp.ClientSession() as session:
+            await remove_all_servers(session)
+            await add_servers(session, n)
 
         counts = await send_requests()
         total_handled = sum(v for k, v in counts.items() if k != "error")
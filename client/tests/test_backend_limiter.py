@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from async_load_balancer import BackendLimiter, Overloaded
+
+def test_limiter_queues_then_rejects():
+    async def scenario():
+        limiter = BackendLimiter(limit=2, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter:
+                await release.wait()
+
+        holders = [asyncio.create_task(hold()) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert (limiter.in_flight, limiter.waiting) == (2, 1)
+        with pytest.raises(Overloaded):
+            async with limiter:
+                pass
+        release.set()
+        await asyncio.gather(*holders)
+        assert (limiter.in_flight, limiter.waiting) == (0, 0)
+
+    asyncio.run(scenario())
@@ -0,0 +1,55 @@
+from consistent_hash import ConsistentHash
+from load_tracker import LoadTracker
+
+IDS = [f"user-{i}" for i in range(1000)]
+
+def make_ring(loads, names=("server1", "server2", "server3"), epsilon=0.25, **kwargs):
+    ring = ConsistentHash(epsilon=epsilon, loads=loads, **kwargs)
+    for name in names:
+        ring.add_server(name)
+    return ring
+
+def test_bounded_load_never_exceeds_capacity():
+    loads = LoadTracker()
+    ring = make_ring(loads, ["server1", "server2", "server3", "server4"])
+    # Requests that never finish: every pick adds to the chosen server's load
+    for request_id in IDS[:400]:
+        capacity = ring.capacity()
+        server = ring.get_server(request_id)
+        assert loads.load(server) < capacity
+        loads.start(server)
+    assert max(loads.in_flight.values()) <= ring.capacity()
+
+def test_bounded_load_keeps_owner_when_under_capacity():
+    loads = LoadTracker()
+    ring = make_ring(loads)
+    plain = make_ring(None, epsilon=None)
+    assert [ring.get_server(i) for i in IDS[:100]] == plain.get_servers(IDS[:100])
+
+def test_bounded_load_skips_overloaded_owner():
+    loads = LoadTracker()
+    ring = make_ring(loads)
+    owner = ring.get_server("key")
+    for _ in range(10):
+        loads.start(owner)
+    assert ring.get_server("key") == list(ring.iter_servers("key"))[1]
+
+def test_capacity_bound():
+    loads = LoadTracker()
+    ring = make_ring(loads, epsilon=0.5)
+    assert ring.capacity() == 1  # ceil(1.5 * 1 / 3)
+    for _ in range(5):
+        loads.start("server1")
+    assert ring.capacity() == 3  # ceil(1.5 * 6 / 3)
+
+def test_rate_source_spreads_a_hot_key():
+    loads = LoadTracker(source="rate", window=60.0)
+    ring = make_ring(loads)
+    picks = []
+    for _ in range(300):
+        server = ring.get_server("hot")
+        loads.start(server)
+        loads.finish(server)
+        picks.append(server)
+    # Finished requests still count under "rate", so one key cannot pin a server
+    assert max(picks.count(s) for s in set(picks)) <= 0.5 * len(picks)
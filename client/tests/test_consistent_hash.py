@@ -0,0 +1,73 @@
+import pytest
+
+from consistent_hash import PLACEMENTS, ConsistentHash
+
+IDS = [f"user-{i}" for i in range(5000)]
+
+def make_ring(names, **kwargs):
+    ring = ConsistentHash(**kwargs)
+    for name in names:
+        ring.add_server(name)
+    return ring
+
+def test_lookup_matches_ring_successor():
+    ring = make_ring(["server1", "server2", "server3"])
+    slots, owners = ring._ring
+    assert slots == sorted(slots)
+    for request_id in IDS[:200]:
+        key = ring.hash_request(request_id)
+        successor = next((s for s in slots if s >= key), slots[0])
+        assert ring.get_server(request_id) == ring.servers[successor]
+
+@pytest.mark.parametrize("hash_function", ["blake2b", "lab"])
+def test_batch_lookup_matches_single_lookups(hash_function):
+    ring = make_ring([f"server{i}" for i in range(1, 9)], hash_function=hash_function, num_virtual=50)
+    ids = IDS + list(range(1000))
+    assert ring.get_servers(ids) == [ring.get_server(i) for i in ids]
+
+def test_empty_ring_and_round_robin():
+    ring = ConsistentHash()
+    assert ring.get_server("x") is None
+    assert ring.get_servers(["x", "y"]) == [None, None]
+    ring.add_server("server1")
+    ring.add_server("server2")
+    assert [ring.get_server() for _ in range(4)] == ["server1", "server2", "server1", "server2"]
+
+@pytest.mark.parametrize("placement", PLACEMENTS)
+def test_add_only_moves_ids_to_new_server(placement):
+    ring = make_ring([f"server{i}" for i in range(1, 6)], placement=placement, num_virtual=100)
+    before = ring.get_servers(IDS)
+    version = ring.version
+    ring.add_server("server6")
+    after = ring.get_servers(IDS)
+
+    assert ring.version == version + 1
+    moved = [(b, a) for b, a in zip(before, after) if b != a]
+    # About 1/6 of the keys should move, all to the new server; Maglev may
+    # move a few extra keys while rebuilding its table
+    assert 0.08 < len(moved) / len(IDS) < 0.3
+    unrelated = sum(1 for _, a in moved if a != "server6")
+    assert unrelated == 0 or (placement == "maglev" and unrelated / len(IDS) < 0.05)
+
+@pytest.mark.parametrize("placement", ["ring", "maglev"])
+def test_remove_only_moves_ids_of_removed_server(placement):
+    ring = make_ring([f"server{i}" for i in range(1, 6)], placement=placement, num_virtual=100)
+    before = ring.get_servers(IDS)
+    ring.remove_server("server3")
+    after = ring.get_servers(IDS)
+
+    assert "server3" not in after
+    for b, a in zip(before, after):
+        if b != "server3":
+            # Maglev may move a few extra keys while rebuilding its table
+            assert a == b or placement == "maglev"
+    if placement == "maglev":
+        unrelated = sum(1 for b, a in zip(before, after) if b != "server3" and a != b)
+        assert unrelated / len(IDS) < 0.05
+
+def test_remove_then_add_restores_mapping():
+    ring = make_ring(["server1", "server2", "server3"])
+    before = ring.get_servers(IDS)
+    ring.remove_server("server2")
+    ring.add_server("server2")
+    assert ring.get_servers(IDS) == before
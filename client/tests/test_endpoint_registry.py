@@ -0,0 +1,57 @@
+from endpoint_registry import EndpointRegistry
+
+def make_registry(ports=None):
+    """A registry whose `docker inspect` answers from `ports` (container id → port)."""
+    registry = EndpointRegistry()
+    registry.resolve_port = lambda cid: (ports or {}).get(cid)
+    return registry
+
+def test_register_resolves_port_once():
+    calls = []
+    registry = EndpointRegistry()
+    registry.resolve_port = lambda cid: calls.append(cid) or "5001"
+    registry.register("cid1", "server1")
+    for _ in range(3):
+        assert registry.endpoint("server1") == ("cid1", "localhost", "5001")
+    assert calls == ["cid1"]
+
+def test_unknown_name():
+    registry = make_registry()
+    assert registry.endpoint("nope") is None
+    assert registry.container_id("nope") is None
+    assert registry.unregister("nope") is None
+
+def test_die_then_start_refreshes_port():
+    ports = {"cid1": "5001"}
+    registry = make_registry(ports)
+    registry.register("cid1", "server1")
+
+    registry.handle_event("die", "cid1")
+    assert registry.endpoint("server1") == ("cid1", "localhost", None)
+
+    ports["cid1"] = "5009"
+    registry.handle_event("start", "cid1")
+    assert registry.endpoint("server1") == ("cid1", "localhost", "5009")
+
+def test_destroy_unregisters():
+    registry = make_registry({"cid1": "5001"})
+    registry.register("cid1", "server1")
+    registry.handle_event("destroy", "cid1")
+    assert registry.endpoint("server1") is None
+    assert len(registry) == 0
+
+def test_events_for_unknown_containers_are_ignored():
+    registry = make_registry({"cid1": "5001", "other": "6000"})
+    registry.register("cid1", "server1")
+    registry.handle_event("start", "other")
+    registry.handle_event("destroy", "other")
+    assert registry.names() == ["server1"]
+
+def test_snapshot_restore_round_trip():
+    registry = make_registry()
+    registry.register("cid1", "server1", "5001")
+    registry.register("cid2", "server2", "5002")
+    copy = make_registry()
+    copy.restore(registry.snapshot())
+    assert copy.items() == registry.items()
+    assert copy.endpoint("server2") == ("cid2", "localhost", "5002")
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+from failover import Failover, LatencyWindow, RetryBudget
+
+def sender(failing, calls, delay=None):
+    """send(server, cancel=None) that fails for servers in `failing`."""
+    def send(server, cancel=None):
+        calls.append(server)
+        if delay:
+            time.sleep(delay.get(server, 0))
+        if server in failing:
+            raise ConnectionRefusedError(server)
+        return f"ok from {server}"
+    return send
+
+def test_first_server_answers():
+    calls = []
+    server, result = Failover(attempts=3).call(["a", "b", "c"], sender(set(), calls))
+    assert (server, result) == ("a", "ok from a")
+    assert calls == ["a"]
+
+def test_retries_next_server_on_retryable_error():
+    calls = []
+    server, _ = Failover(attempts=3).call(["a", "b", "c"], sender({"a", "b"}, calls))
+    assert server == "c"
+    assert calls == ["a", "b", "c"]
+
+def test_gives_up_after_attempts():
+    calls = []
+    with pytest.raises(ConnectionRefusedError):
+        Failover(attempts=2).call(["a", "b", "c"], sender({"a", "b", "c"}, calls))
+    assert calls == ["a", "b"]
+
+def test_non_retryable_error_is_not_retried():
+    calls = []
+
+    def send(server):
+        calls.append(server)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        Failover(attempts=3).call(["a", "b"], send)
+    assert calls == ["a"]
+
+def test_no_candidates():
+    with pytest.raises(ConnectionError, match="No server available"):
+        Failover().call([], sender(set(), []))
+
+def test_exhausted_budget_stops_retries():
+    budget = RetryBudget(ratio=0.0, min_per_sec=0.1, window=10.0)  # one retry in total
+    failover = Failover(attempts=3, budget=budget)
+    calls = []
+    assert failover.call(["a", "b"], sender({"a"}, calls))[0] == "b"
+    calls.clear()
+    with pytest.raises(ConnectionRefusedError):
+        failover.call(["a", "b"], sender({"a"}, calls))
+    assert calls == ["a"]
+
+def test_budget_grows_with_requests():
+    budget = RetryBudget(ratio=0.5, min_per_sec=0.0, window=10.0)
+    assert not budget.try_spend()
+    for _ in range(5):  # counts decay a little, so 5 requests allow two retries
+        budget.record_request()
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+def test_latency_window_quantile():
+    window = LatencyWindow(size=100, refresh=1)
+    assert window.quantile(0.5) is None
+    for ms in range(1, 101):
+        window.record(ms / 1000)
+    assert window.quantile(0.5) == pytest.approx(0.051)
+    assert window.quantile(0.99) == pytest.approx(0.1)
+
+def test_hedge_answers_for_slow_primary():
+    failover = Failover(attempts=2, hedge=True, hedge_min_delay=0.01)
+    calls = []
+    start = time.perf_counter()
+    server, _ = failover.call(["slow", "fast"], sender(set(), calls, delay={"slow": 0.3}))
+    assert server == "fast"
+    assert calls == ["slow", "fast"]
+    # The primary still runs to completion here (the stub ignores cancel),
+    # but the hedge's answer is the one returned
+    assert time.perf_counter() - start >= 0.3
+
+def test_no_hedge_for_fast_primary():
+    failover = Failover(attempts=2, hedge=True, hedge_min_delay=0.2)
+    calls = []
+    assert failover.call(["a", "b"], sender(set(), calls))[0] == "a"
+    assert calls == ["a"]
+
+def test_hedged_call_falls_back_to_retry():
+    failover = Failover(attempts=3, hedge=True, hedge_min_delay=0.2)
+    calls = []
+    assert failover.call(["a", "b"], sender({"a"}, calls))[0] == "b"
+    assert calls == ["a", "b"]
+
+def test_hedge_winner_is_discarded_when_primary_fails_hard():
+    failover = Failover(attempts=2, hedge=True, hedge_min_delay=0.01)
+    released = []
+
+    def send(server, cancel=None):
+        if server == "a":
+            time.sleep(0.1)
+            raise ValueError("bad request")
+        return f"ok from {server}"
+
+    with pytest.raises(ValueError):
+        failover.call(["a", "b"], send, discard=lambda server, result: released.append(server))
+    assert released == ["b"]
+
+def test_no_hedge_after_primary_fails_hard():
+    failover = Failover(attempts=2, hedge=True, hedge_min_delay=0.05)
+    calls = []
+
+    def send(server, cancel=None):
+        calls.append(server)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        failover.call(["a", "b"], send)
+    time.sleep(0.1)
+    assert calls == ["a"]
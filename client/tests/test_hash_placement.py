@@ -0,0 +1,72 @@
+from collections import Counter
+
+import pytest
+
+from consistent_hash import HASH_FUNCTIONS, PLACEMENTS, ConsistentHash, jump_hash, maglev_table
+
+IDS = [f"user-{i}" for i in range(5000)]
+
+def make_ring(names, **kwargs):
+    ring = ConsistentHash(**kwargs)
+    for name in names:
+        ring.add_server(name)
+    return ring
+
+@pytest.mark.parametrize("placement", PLACEMENTS)
+@pytest.mark.parametrize("hash_function", [h for h in HASH_FUNCTIONS if h != "lab"])
+def test_lookup_is_stable_per_id(hash_function, placement):
+    ring = make_ring(["server1", "server2", "server3"], hash_function=hash_function, placement=placement)
+    first = [ring.get_server(i) for i in IDS]
+    assert [ring.get_server(i) for i in IDS] == first
+    assert ring.get_servers(IDS) == first
+    assert set(first) == {"server1", "server2", "server3"}
+
+def test_lab_hash_keeps_original_formulas():
+    ring = make_ring(["server1", "server2"], hash_function="lab")
+    assert ring.hash_request(3) == (9 + 6 + 17) % 512
+    assert ring.virtual_servers["server1"][0] == (1 + 0 + 0 + 25) % 512
+    assert ring.get_server(3) in ("server1", "server2")
+
+def test_default_hash_is_blake2b():
+    assert ConsistentHash().hash_function == "blake2b"
+
+@pytest.mark.parametrize("hash_function", [h for h in HASH_FUNCTIONS if h != "lab"])
+def test_64_bit_hashes_spread_evenly(hash_function):
+    ring = make_ring([f"server{i}" for i in range(1, 5)], hash_function=hash_function, num_virtual=100)
+    counts = Counter(ring.get_servers(IDS))
+    assert max(counts.values()) / (len(IDS) / 4) < 1.3
+
+def test_jump_hash_moves_only_to_new_bucket():
+    keys = range(0, 2**64, 2**50)
+    before = [jump_hash(k, 10) for k in keys]
+    after = [jump_hash(k, 11) for k in keys]
+    assert all(a == b or a == 10 for b, a in zip(before, after))
+    assert all(0 <= b < 10 for b in before)
+
+def test_maglev_table_is_balanced():
+    table = maglev_table(["a", "b", "c"], 65537, ConsistentHash()._maglev_hash)
+    counts = Counter(table)
+    assert set(counts) == {"a", "b", "c"}
+    assert max(counts.values()) - min(counts.values()) <= 1
+
+@pytest.mark.parametrize("placement", PLACEMENTS)
+def test_iter_servers_yields_each_server_once(placement):
+    ring = make_ring(["server1", "server2", "server3"], placement=placement)
+    order = list(ring.iter_servers("key"))
+    assert sorted(order) == ["server1", "server2", "server3"]
+    assert order[0] == ring.get_server("key")
+
+def test_iter_servers_stops_once_every_server_is_seen():
+    ring = make_ring(["server1", "server2"], placement="maglev")
+    walked = 0
+    walk = ring._walk
+
+    def counting_walk(key):
+        nonlocal walked
+        for server in walk(key):
+            walked += 1
+            yield server
+
+    ring._walk = counting_walk
+    assert len(list(ring.iter_servers("key"))) == 2
+    assert walked < 100  # not the whole 65537-entry table
@@ -0,0 +1,77 @@
+from consistent_hash import ConsistentHash
+from endpoint_registry import EndpointRegistry
+from health_check import HealthChecker
+
+def make_checker(names=("server1", "server2"), **kwargs):
+    ring = ConsistentHash()
+    registry = EndpointRegistry()
+    for i, name in enumerate(names):
+        registry.register(f"cid{i}", name, str(5001 + i))
+        ring.add_server(name)
+    checker = HealthChecker(ring, registry, failures=3, recovery=2, **kwargs)
+    return checker, ring, registry
+
+def probe_results(checker, results):
+    """Makes probe() answer from `results` (name → error or None) instead of HTTP."""
+    checker.probe = lambda name: results.get(name)
+
+def test_evicts_after_consecutive_failures():
+    evicted = []
+    checker, ring, _ = make_checker(on_evict=evicted.append)
+    for _ in range(2):
+        checker.record("server1", "refused")
+    checker.record("server1", None)  # a success resets the count
+    for _ in range(2):
+        checker.record("server1", "refused")
+    assert "server1" in ring
+    checker.record("server1", "refused")
+    assert "server1" not in ring
+    assert evicted == ["server1"]
+    assert checker.snapshot()["server1"]["in_ring"] is False
+
+def test_readmits_after_recovery():
+    checker, ring, _ = make_checker()
+    for _ in range(3):
+        checker.record("server1", "refused")
+    checker.record("server1", None)
+    assert "server1" not in ring
+    checker.record("server1", None)
+    assert "server1" in ring
+
+def test_check_all_probes_members_and_evicted():
+    checker, ring, _ = make_checker()
+    results = {"server1": "refused"}
+    probe_results(checker, results)
+    for _ in range(3):
+        checker.check_all()
+    assert ring.round_robin_order == ["server2"]
+    del results["server1"]
+    for _ in range(2):
+        checker.check_all()
+    assert sorted(ring.round_robin_order) == ["server1", "server2"]
+
+def test_destroyed_member_is_evicted():
+    checker, ring, registry = make_checker()
+    registry.unregister("server1")  # docker run --rm: die, then destroy
+    for _ in range(3):
+        checker.check_all()
+    assert "server1" not in ring
+    checker.check_all()
+    assert "server1" not in checker.snapshot()
+
+def test_servers_outside_the_ring_are_ignored():
+    checker, ring, registry = make_checker(names=("server1",))
+    registry.register("cid9", "starting", "5009")
+    checker.record("starting", None)
+    assert "starting" not in checker.snapshot()
+    assert "starting" not in ring
+
+def test_remove_stops_readmission():
+    checker, ring, _ = make_checker()
+    for _ in range(3):
+        checker.record("server1", "refused")
+    checker.record("server1", None)
+    checker.remove("server1")
+    checker.record("server1", None)
+    assert "server1" not in ring
+    assert "server1" not in checker.snapshot()
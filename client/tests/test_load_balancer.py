@@ -0,0 +1,168 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import load_balancer as lb
+from consistent_hash import ConsistentHash
+from endpoint_registry import EndpointRegistry
+from load_tracker import LoadTracker
+from metrics import MetricsRegistry
+from response_cache import ResponseCache
+from routing import Router
+from shared_ring import SharedRing
+from upstream_pool import PoolManager
+
+class Backend(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        self.server.hits += 1
+        body = b'{"message": "Hello from Server: 1"}'
+        self.send_response(self.server.status)  # also sends Server and Date
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "X-Trace")
+        self.send_header("X-Trace", "abc")
+        self.send_header("Keep-Alive", "timeout=5")
+        self.send_header("X-Request-Id", "7")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def backend(monkeypatch):
+    """A local backend registered as server1, the only server in the ring."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Backend)
+    server.daemon_threads = True
+    server.hits = 0
+    server.status = 200
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    host, port = server.server_address
+
+    ring = ConsistentHash()
+    ring.add_server("server1")
+    registry = EndpointRegistry(host)
+    registry.register("cid-1", "server1", port)
+    pools = PoolManager()
+    pools.create("server1", host, port)
+    loads = LoadTracker()
+    for name, value in (("ch", ring), ("servers", registry), ("pools", pools), ("loads", loads),
+                        ("router", Router(ring, loads)), ("cache", None)):
+        monkeypatch.setattr(lb, name, value)
+    yield server
+    pools.drain("server1")
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def workers(monkeypatch):
+    """Runs the module as worker 0 of two, with fresh shared state."""
+    shared = SharedRing(1 << 16)
+    with shared.lock:
+        shared.publish({"ring": lb.ch.snapshot(), "endpoints": {}})
+    monkeypatch.setattr(lb, "shared", shared)
+    monkeypatch.setattr(lb, "_synced_version", 0)
+    monkeypatch.setattr(lb, "servers", EndpointRegistry())
+    monkeypatch.setattr(lb, "loads", LoadTracker())
+    monkeypatch.setattr(lb, "worker_stats", [SharedRing(1 << 16), SharedRing(1 << 16)])
+    monkeypatch.setattr(lb, "worker_index", 0)
+    return shared
+
+def publish_peer(state):
+    slot = lb.worker_stats[1]
+    with slot.lock:
+        slot.publish(state)
+
+def test_pending_container_is_not_published(workers, monkeypatch):
+    published = []
+    stopped = []
+
+    def wait_ready(host, port):
+        # Another thread changes the cluster while this container starts
+        with lb.cluster_update():
+            pass
+        published.append(workers.read()[1]["endpoints"])
+        return False
+
+    monkeypatch.setattr(lb.provisioner, "run_container", lambda name, server_id: "cid-new")
+    monkeypatch.setattr(lb.provisioner, "wait_ready", wait_ready)
+    monkeypatch.setattr(lb.provisioner, "stop_container", stopped.append)
+    monkeypatch.setattr(lb.servers, "resolve_port", lambda cid: "5999")
+
+    assert lb.start_server("server-new", 1) is None
+    assert published == [{}]
+    assert workers.read()[1]["endpoints"] == {}
+    assert stopped == ["server-new"]
+    assert len(lb.servers) == 0
+
+def test_in_flight_everywhere_adds_up_workers(workers):
+    lb.loads.start("server1")
+    publish_peer({"version": 3, "in_flight": {"server1": 2}, "metrics": {}})
+    assert lb.in_flight_everywhere("server1", 3) == 3
+    assert lb.in_flight_everywhere("server2", 3) == 0
+
+def test_in_flight_everywhere_waits_for_lagging_worker(workers):
+    publish_peer({"version": 2, "in_flight": {}, "metrics": {}})
+    assert lb.in_flight_everywhere("server1", 3) is None
+
+def test_passthrough_relays_status_body_and_end_to_end_headers(backend):
+    backend.status = 201
+    res = lb.app.test_client().get("/home?id=7")
+    try:
+        assert res.status_code == 201
+        assert res.data == b'{"message": "Hello from Server: 1"}'
+        assert res.headers["Content-Type"] == "application/json"
+        assert res.headers["X-Request-Id"] == "7"
+        assert res.headers["X-Forwarded-To"] == "server1"
+        assert res.headers["X-Container-Id"] == "cid-1"
+        for name in ("Connection", "X-Trace", "Keep-Alive", "Server", "Date"):
+            assert name not in res.headers
+    finally:
+        res.close()
+    assert lb.loads.in_flight.get("server1", 0) == 0
+
+def get_home(query):
+    res = lb.app.test_client().get(f"/home?{query}")
+    res.close()
+    return res.status_code
+
+@pytest.fixture
+def cached(backend, monkeypatch):
+    """Enables the response cache, as RESPONSE_CACHE_BYTES would at import."""
+    monkeypatch.setattr(lb, "cache", ResponseCache(max_bytes=10000, ttl=60))
+    lookups = MetricsRegistry().counter("lb_cache_lookups_total", "", ("outcome",))
+    monkeypatch.setattr(lb, "cache_lookups_total", lookups, raising=False)
+    return backend
+
+def test_cache_serves_repeated_ring_requests(cached):
+    assert [get_home("id=7") for _ in range(3)] == [200, 200, 200]
+    assert cached.hits == 1
+    # A ring change retires the entry even if the mapping comes back the same
+    lb.ch.remove_server("server1")
+    lb.ch.add_server("server1")
+    get_home("id=7")
+    assert cached.hits == 2
+
+def test_cache_skips_load_aware_modes(cached):
+    get_home("id=7")
+    for _ in range(2):
+        # Not answered from the ring-mode entry, nor cached under the id
+        assert get_home("id=7&mode=least_outstanding") == 200
+    assert cached.hits == 3
+    assert lb.cache.stats()["hits"] == 0
+
+def test_refused_forward_counts_as_a_slow_sample(backend):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        dead_port = sock.getsockname()[1]
+    lb.servers.register("cid-2", "server2", dead_port)
+    pool = lb.pools.create("server2", "127.0.0.1", dead_port)
+    with pytest.raises(ConnectionRefusedError):
+        lb.forward("server2")
+    # ewma routing would otherwise favour a backend that refuses instantly
+    assert lb.loads.latency_ewma["server2"] >= pool.timeout
+    assert lb.loads.in_flight.get("server2", 0) == 0
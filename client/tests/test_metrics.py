@@ -0,0 +1,68 @@
+import json
+
+from metrics import MetricsRegistry
+
+def make_registry():
+    metrics = MetricsRegistry()
+    requests = metrics.counter("lb_requests_total", "Requests", ("backend",))
+    phases = metrics.histogram("lb_phase_seconds", "Phases", ("backend", "phase"), buckets=(0.01, 0.1))
+    in_flight = {"server1": 2}
+    metrics.gauge("lb_in_flight", "In flight", lambda: {(s,): n for s, n in in_flight.items()},
+                  ("backend",), summed=True)
+    metrics.gauge("lb_ring_servers", "Servers", lambda: {(): 3})
+    return metrics, requests, phases
+
+def lines(text):
+    return [line for line in text.splitlines() if not line.startswith("#")]
+
+def test_render_exposition_format():
+    metrics, requests, phases = make_registry()
+    requests.inc("server1")
+    requests.inc("server1")
+    phases.observe(0.005, "server1", "forward")
+    phases.observe(0.05, "server1", "forward")
+    text = metrics.render()
+
+    assert "# TYPE lb_requests_total counter" in text
+    assert "# TYPE lb_phase_seconds histogram" in text
+    assert lines(text) == [
+        'lb_requests_total{backend="server1"} 2',
+        'lb_phase_seconds_bucket{backend="server1",phase="forward",le="0.01"} 1',
+        'lb_phase_seconds_bucket{backend="server1",phase="forward",le="0.1"} 2',
+        'lb_phase_seconds_bucket{backend="server1",phase="forward",le="+Inf"} 2',
+        'lb_phase_seconds_sum{backend="server1",phase="forward"} 0.055',
+        'lb_phase_seconds_count{backend="server1",phase="forward"} 2',
+        'lb_in_flight{backend="server1"} 2',
+        "lb_ring_servers 3",
+    ]
+
+def test_forget_drops_a_backend():
+    metrics, requests, phases = make_registry()
+    requests.inc("server1")
+    requests.inc("server2")
+    phases.observe(0.005, "server1", "forward")
+    metrics.forget("server1")
+    text = metrics.render()
+    assert not [line for line in lines(text) if "server1" in line and not line.startswith("lb_in_flight")]
+    assert 'lb_requests_total{backend="server2"} 1' in text
+
+def test_render_merges_peer_exports():
+    metrics, requests, phases = make_registry()
+    peer, peer_requests, peer_phases = make_registry()
+    requests.inc("server1")
+    peer_requests.inc("server1", amount=4)
+    peer_requests.inc("server2")
+    phases.observe(0.005, "server1", "forward")
+    peer_phases.observe(0.5, "server1", "forward")
+
+    # Exports travel between workers as JSON
+    exported = json.loads(json.dumps(peer.export()))
+    text = metrics.render([exported])
+
+    assert 'lb_requests_total{backend="server1"} 5' in text
+    assert 'lb_requests_total{backend="server2"} 1' in text
+    assert 'lb_phase_seconds_bucket{backend="server1",phase="forward",le="0.1"} 1' in text
+    assert 'lb_phase_seconds_count{backend="server1",phase="forward"} 2' in text
+    assert 'lb_in_flight{backend="server1"} 4' in text  # summed gauge
+    assert "lb_ring_servers 3" in text  # shared state, not summed
+    assert "lb_ring_servers" not in exported
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from consistent_hash import ConsistentHash
+from load_tracker import LoadTracker
+import provisioner
+
+IDS = [f"user-{i}" for i in range(1000)]
+
+def test_concurrent_membership_changes_keep_every_server():
+    ring = ConsistentHash()
+    names = [f"server{i}" for i in range(40)]
+    threads = [threading.Thread(target=ring.add_server, args=(name,)) for name in names]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(ring.round_robin_order) == sorted(names)
+    assert len(ring._ring[0]) == len(names) * ring.num_virtual
+    assert set(ring.get_servers(IDS)) == set(names)
+
+def test_run_parallel_keeps_order_and_overlaps():
+    start = time.monotonic()
+    results = provisioner.run_parallel(lambda i: time.sleep(0.1) or i * 2, range(4))
+    assert results == [0, 2, 4, 6]
+    assert time.monotonic() - start < 0.35
+    assert provisioner.run_parallel(lambda i: i, []) == []
+
+def test_wait_drained_waits_for_in_flight():
+    loads = LoadTracker()
+    loads.start("server1")
+    threading.Timer(0.1, loads.finish, args=("server1",)).start()
+    start = time.monotonic()
+    assert provisioner.wait_drained(lambda: loads.in_flight.get("server1", 0), timeout=2)
+    assert time.monotonic() - start >= 0.09
+
+def test_wait_drained_gives_up():
+    loads = LoadTracker()
+    loads.start("server1")
+    assert not provisioner.wait_drained(lambda: loads.in_flight.get("server1", 0), timeout=0.1)
+
+def test_wait_drained_waits_while_count_unknown():
+    assert not provisioner.wait_drained(lambda: None, timeout=0.1)
+
+def test_wait_ready_times_out_without_port():
+    assert not provisioner.wait_ready("localhost", None, timeout=0.05, interval=0.01)
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from response_cache import CachedResponse, ResponseCache, merge_stats
+
+def response(server="server1", body=b"x" * 100, status=200):
+    return CachedResponse(server, "cid", status, [], body)
+
+def test_hit_after_miss():
+    cache = ResponseCache(max_bytes=10000, ttl=60)
+    first, outcome = cache.get("a", response)
+    assert outcome == "miss"
+    second, outcome = cache.get("a", lambda: pytest.fail("loaded twice"))
+    assert outcome == "hit"
+    assert second is first
+    assert cache.stats()["hit_rate"] == 0.5
+
+def test_concurrent_misses_share_one_load():
+    cache = ResponseCache(max_bytes=10000, ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return response()
+
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(cache.get("a", load)[1])) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while cache.coalesced < 7:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(outcomes) == ["coalesced"] * 7 + ["miss"]
+
+def test_coalesced_callers_see_the_load_error():
+    cache = ResponseCache(max_bytes=10000, ttl=60)
+    started, release = threading.Event(), threading.Event()
+
+    def load():
+        started.set()
+        release.wait(5)
+        raise ConnectionError("down")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get("a", load)
+        except ConnectionError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while cache.coalesced < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2
+    assert len(cache) == 0
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(max_bytes=10000, ttl=0.05)
+    cache.get("a", response)
+    time.sleep(0.1)
+    _, outcome = cache.get("a", response)
+    assert outcome == "miss"
+    assert cache.stats()["entries"] == 1
+
+def test_non_200_responses_are_not_stored():
+    cache = ResponseCache(max_bytes=10000, ttl=60)
+    cache.get("a", lambda: response(status=500))
+    assert len(cache) == 0
+    assert cache.get("a", response)[1] == "miss"
+
+def test_lru_eviction_within_byte_budget():
+    cache = ResponseCache(max_bytes=350, ttl=60)  # room for three 100-byte bodies
+    for key in "abc":
+        cache.get(key, response)
+    cache.get("a", response)  # a is now the most recently used
+    cache.get("d", response)
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.bytes <= 350
+    assert cache.get("b", response)[1] == "miss"
+    assert cache.get("a", lambda: pytest.fail("a was evicted"))[1] == "hit"
+
+def test_oversized_response_is_not_stored():
+    cache = ResponseCache(max_bytes=50, ttl=60)
+    cache.get("a", response)
+    assert len(cache) == 0
+    assert cache.bytes == 0
+
+def test_invalidate_server_drops_only_its_entries():
+    cache = ResponseCache(max_bytes=10000, ttl=60)
+    cache.get("a", lambda: response("server1"))
+    cache.get("b", lambda: response("server2"))
+    cache.invalidate_server("server1")
+    assert cache.get("a", response)[1] == "miss"
+    assert cache.get("b", response)[1] == "hit"
+
+def test_merge_stats_sums_workers():
+    one, two = ResponseCache(max_bytes=10000, ttl=60), ResponseCache(max_bytes=10000, ttl=60)
+    one.get("a", response)
+    one.get("a", response)
+    two.get("b", response)
+    merged = merge_stats([one.stats(), two.stats()])
+    assert merged["entries"] == 2
+    assert merged["hits"] == 1
+    assert merged["misses"] == 2
+    assert merged["hit_rate"] == pytest.approx(1 / 3)
@@ -0,0 +1,95 @@
+from collections import Counter
+
+import pytest
+
+from consistent_hash import ConsistentHash
+from load_tracker import LoadTracker
+from routing import Router
+
+IDS = [f"user-{i}" for i in range(200)]
+NAMES = ["server1", "server2", "server3"]
+
+def make_router(mode, names=NAMES, seed=1):
+    ring = ConsistentHash()
+    for name in names:
+        ring.add_server(name)
+    loads = LoadTracker()
+    return Router(ring, loads, mode, seed=seed), loads
+
+def picks(router, n=300, mode=None):
+    return Counter(router.get_server(None, mode) for _ in range(n))
+
+def test_ring_mode_defers_to_the_ring():
+    router, loads = make_router("ring")
+    loads.start("server1")
+    assert [router.get_server(i) for i in IDS] == router.ring.get_servers(IDS)
+
+def test_least_outstanding_picks_fewest_in_flight():
+    router, loads = make_router("least_outstanding")
+    for server, count in (("server1", 3), ("server2", 1), ("server3", 2)):
+        for _ in range(count):
+            loads.start(server)
+    assert picks(router, 10) == {"server2": 10}
+
+def test_least_outstanding_shares_ties_round_robin():
+    router, _ = make_router("least_outstanding")
+    assert picks(router, 300) == {"server1": 100, "server2": 100, "server3": 100}
+
+def test_p2c_never_picks_the_most_loaded_server():
+    router, loads = make_router("p2c")
+    for _ in range(5):
+        loads.start("server1")
+    counts = picks(router)
+    assert "server1" not in counts
+    assert counts["server2"] > 50 and counts["server3"] > 50
+
+def test_p2c_with_one_server():
+    router, _ = make_router("p2c", ["server1"])
+    assert router.get_server() == "server1"
+
+def test_ewma_prefers_fast_server():
+    router, loads = make_router("ewma")
+    for server, seconds in (("server1", 0.05), ("server2", 0.01), ("server3", 0.02)):
+        loads.record_latency(server, seconds)
+    assert picks(router, 10) == {"server2": 10}
+    # Enough requests in flight outweigh the lower latency
+    for _ in range(3):
+        loads.start("server2")
+    assert router.get_server() == "server3"
+
+def test_ewma_prices_unsampled_server_at_the_average():
+    router, loads = make_router("ewma")
+    loads.record_latency("server1", 0.01)
+    loads.record_latency("server2", 0.03)
+    # server3 has no sample: priced at 0.02, so it is not flooded as if free
+    assert picks(router, 10) == {"server1": 10}
+    loads.start("server1")
+    assert router.get_server() == "server3"
+
+def test_ewma_avoids_server_after_failure_sample():
+    router, loads = make_router("ewma")
+    for server in NAMES:
+        loads.record_latency(server, 0.01)
+    # A failed forward is recorded as a sample no faster than the timeout
+    loads.record_latency("server1", 2.0)
+    assert "server1" not in picks(router, 30)
+
+def test_load_aware_modes_on_empty_ring():
+    for mode in ("least_outstanding", "p2c", "ewma"):
+        router, _ = make_router(mode, [])
+        assert router.get_server() is None
+
+def test_mode_override_per_request():
+    router, loads = make_router("ring")
+    for _ in range(2):
+        loads.start("server1")
+        loads.start("server2")
+    assert router.get_server("user-1", "least_outstanding") == "server3"
+    assert router.get_server("user-1") == router.ring.get_server("user-1")
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        make_router("random")
+    router, _ = make_router("ring")
+    with pytest.raises(ValueError):
+        router.get_server("user-1", "random")
@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+from consistent_hash import PLACEMENTS, ConsistentHash
+from shared_ring import _HEADER, SharedRing
+
+IDS = [f"user-{i}" for i in range(2000)]
+
+def test_empty_ring_reads_nothing():
+    shared = SharedRing(4096)
+    assert shared.version == 0
+    assert shared.read() == (0, None)
+
+def test_publish_then_read():
+    shared = SharedRing(4096)
+    with shared.lock:
+        shared.publish({"a": 1})
+        shared.publish({"a": 2})
+    assert shared.read() == (2, {"a": 2})
+    assert shared.version == 2
+
+def test_snapshot_too_large_is_rejected():
+    shared = SharedRing(64)
+    with pytest.raises(ValueError):
+        shared.publish({"ring": "x" * 100})
+    assert shared.read() == (0, None)
+
+def test_read_gives_up_on_a_stuck_writer():
+    shared = SharedRing(4096)
+    with shared.lock:
+        shared.publish({"a": 1})
+    # A writer that died mid-publish leaves the sequence number odd
+    _HEADER.pack_into(shared._buf, 0, 3, 0)
+    with pytest.raises(TimeoutError):
+        shared.read(timeout=0.05)
+
+def test_forked_worker_sees_published_snapshot():
+    shared = SharedRing(4096)
+    pid = os.fork()
+    if pid == 0:
+        with shared.lock:
+            shared.publish({"from": "child"})
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert shared.read() == (1, {"from": "child"})
+
+@pytest.mark.parametrize("placement", PLACEMENTS)
+def test_ring_snapshot_restore_round_trip(placement):
+    ring = ConsistentHash(placement=placement)
+    for name in ("server1", "server2", "server3"):
+        ring.add_server(name)
+    ring.remove_server("server2")
+
+    # Snapshots travel between workers as JSON
+    copy = ConsistentHash(placement=placement)
+    copy.restore(json.loads(json.dumps(ring.snapshot())))
+    assert copy.get_servers(IDS) == ring.get_servers(IDS)
+    assert copy.version == ring.version
+    assert copy.round_robin_order == ring.round_robin_order
+    assert list(copy.iter_servers("key")) == list(ring.iter_servers("key"))
@@ -0,0 +1,106 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from upstream_pool import PoolClosed, PoolExhausted, PoolManager, UpstreamPool, relayable_headers
+
+class Backend(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = b'{"message": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Backend)
+    server.daemon_threads = True
+    server.connections = set()  # client (host, port) pairs seen
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get(pool):
+    res = pool.open("GET", "/home")
+    return res.status, res.read()
+
+def test_connection_is_reused(backend):
+    pool = UpstreamPool(*backend.server_address)
+    for _ in range(5):
+        assert get(pool) == (200, b'{"message": "ok"}')
+    assert len(backend.connections) == 1
+
+def test_connection_retired_after_max_requests(backend):
+    pool = UpstreamPool(*backend.server_address, max_requests=2)
+    for _ in range(5):
+        get(pool)
+    assert len(backend.connections) == 3
+
+def test_idle_connection_is_not_reused_after_idle_timeout(backend):
+    pool = UpstreamPool(*backend.server_address, idle_timeout=0.05)
+    get(pool)
+    time.sleep(0.1)
+    get(pool)
+    assert len(backend.connections) == 2
+
+def test_unread_response_is_not_reused(backend):
+    pool = UpstreamPool(*backend.server_address)
+    pool.open("GET", "/home").close()
+    get(pool)
+    assert len(backend.connections) == 2
+
+def test_exhausted_pool_raises_pool_exhausted(backend):
+    pool = UpstreamPool(*backend.server_address, size=1, timeout=0.05)
+    held = pool.open("GET", "/home")
+    with pytest.raises(PoolExhausted):
+        pool.open("GET", "/home")
+    held.read()
+    assert get(pool)[0] == 200
+
+def test_pool_exhausted_is_not_a_timeout():
+    assert not issubclass(PoolExhausted, OSError)
+
+def test_drain_refuses_new_requests_and_closes_checked_out(backend):
+    pool = UpstreamPool(*backend.server_address)
+    held = pool.open("GET", "/home")
+    pool.drain()
+    with pytest.raises(PoolClosed):
+        pool.open("GET", "/home")
+    held.read()
+    assert pool._idle == []
+
+def test_manager_get_does_not_recreate_drained_pool(backend):
+    host, port = backend.server_address
+    pools = PoolManager()
+    created = pools.create("server1", host, port)
+    assert pools.get("server1", host, port) is created
+    pools.drain("server1")
+    assert pools.get("server1", host, port) is None
+    assert "server1" not in pools
+
+def test_manager_get_follows_port_change(backend):
+    host, port = backend.server_address
+    pools = PoolManager()
+    old = pools.create("server1", host, port + 1)
+    new = pools.get("server1", host, port)
+    assert new is not old and new.port == port
+    with pytest.raises(PoolClosed):
+        old.open("GET", "/home")
+
+def test_relayable_headers_strips_hop_by_hop_and_connection_tokens():
+    headers = [
+        ("Content-Type", "application/json"), ("Connection", "keep-alive, X-Trace"),
+        ("Keep-Alive", "timeout=5"), ("Transfer-Encoding", "chunked"), ("x-trace", "abc"),
+        ("Server", "gunicorn"), ("Date", "Sun, 18 Oct 2026 00:00:00 GMT"), ("X-Request-Id", "7"),
+    ]
+    assert relayable_headers(headers) == [("Content-Type", "application/json"), ("X-Request-Id", "7")]
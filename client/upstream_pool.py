@@ -0,0 +1,261 @@
+import http.client
+import os
+import socket
+import threading
+import time
+
+DEFAULT_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "16"))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("UPSTREAM_IDLE_TIMEOUT", "30"))
+DEFAULT_MAX_REQUESTS = int(os.getenv("UPSTREAM_MAX_REQUESTS", "1000"))
+DEFAULT_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "2"))
+CHUNK_SIZE = 64 * 1024
+
+# Hop-by-hop headers describe the upstream connection only (RFC 9110
+# 7.6.1), as does any header named in that response's Connection header
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade"
+}
+# End-to-end headers the proxy's own server sets on every response; relaying
+# the upstream's copies would send them twice
+PROXY_REPLACES = {"server", "date"}
+
+def relayable_headers(headers):
+    """The upstream response's (name, value) pairs a proxy may pass on."""
+    headers = list(headers)
+    drop = HOP_BY_HOP | PROXY_REPLACES
+    for name, value in headers:
+        if name.lower() == "connection":
+            drop.update(token.strip().lower() for token in value.split(","))
+    return [(name, value) for name, value in headers if name.lower() not in drop]
+
+class PoolClosed(Exception):
+    pass
+
+class PoolExhausted(Exception):
+    """Every connection to the backend stayed checked out for `timeout` seconds.
+
+    The load balancer is saturated, not the backend: this is deliberately
+    not a TimeoutError, so it is not retried or counted against the backend.
+    """
+
+class _PooledConnection:
+    def __init__(self, host, port, timeout):
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self.requests = 0
+        self.last_used = time.monotonic()
+
+class Cancel:
+    """Lets another thread abort a request that is waiting for its response.
+
+    cancel() shuts down the connection's socket, so the blocked read fails
+    at once with a connection error.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def bind(self, conn):
+        with self._lock:
+            self._conn = conn
+            cancelled = self.cancelled
+        if cancelled:
+            raise ConnectionAbortedError("Request cancelled")
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            conn = self._conn
+        if conn is not None and conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+class UpstreamResponse:
+    """A response whose body is still on the pooled connection."""
+
+    def __init__(self, pool, pc, res):
+        self.status = res.status
+        self.headers = res.getheaders()
+        self._pool = pool
+        self._pc = pc
+        self._res = res
+        self._complete = False
+        self._released = False
+
+    def chunks(self, size=CHUNK_SIZE):
+        """Yields the body as it arrives, without decoding it."""
+        try:
+            while True:
+                data = self._res.read1(size)
+                if not data:
+                    break
+                yield data
+            self._complete = True
+        finally:
+            self.close()
+
+    def read(self):
+        try:
+            body = self._res.read()
+            self._complete = True
+            return body
+        finally:
+            self.close()
+
+    def close(self):
+        """Releases the connection; it is only reused if the body was fully read."""
+        if self._released:
+            return
+        self._released = True
+        # read1() does not mark the response closed at the end of the body,
+        # and the connection refuses a new request until it is
+        self._res.close()
+        self._pool.release(self._pc, reusable=self._complete and not self._res.will_close)
+
+class UpstreamPool:
+    """Keep-alive HTTP connections to a single backend.
+
+    At most `size` connections are open at once; idle ones are reused LIFO,
+    closed once idle for `idle_timeout` seconds, and retired after serving
+    `max_requests` requests.
+    """
+
+    def __init__(self, host, port, size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 max_requests=DEFAULT_MAX_REQUESTS, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = int(port)
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self._idle = []  # [_PooledConnection], most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def acquire(self):
+        """Checks out a connection, opening a new one if none is idle."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolExhausted(f"No free connection to {self.host}:{self.port}")
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                self._slots.release()
+                raise PoolClosed(f"Pool for {self.host}:{self.port} is drained")
+            while self._idle:
+                pc = self._idle.pop()
+                if now - pc.last_used < self.idle_timeout:
+                    return pc
+                pc.conn.close()
+        return _PooledConnection(self.host, self.port, self.timeout)
+
+    def release(self, pc, reusable=True):
+        """Returns a connection to the pool, or closes it if it is spent."""
+        pc.requests += 1
+        pc.last_used = time.monotonic()
+        keep = reusable and pc.requests < self.max_requests
+        with self._lock:
+            if keep and not self._closed:
+                self._idle.append(pc)
+            else:
+                pc.conn.close()
+        self._slots.release()
+
+    def open(self, method, path, headers=None, cancel=None):
+        """Sends a request and returns an UpstreamResponse once headers arrive.
+
+        The body has not been read yet; the connection goes back to the pool
+        when the response is fully read or closed. A Cancel passed as
+        `cancel` can abort the wait for the response from another thread.
+        """
+        pc = self.acquire()
+        reused = pc.requests > 0
+        try:
+            try:
+                res = self._send(pc, method, path, headers, cancel)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The backend may have closed an idle keep-alive connection
+                # just before we reused it; retry once on a fresh one.
+                if not reused or (cancel is not None and cancel.cancelled):
+                    raise
+                pc.conn.close()
+                pc = _PooledConnection(self.host, self.port, self.timeout)
+                res = self._send(pc, method, path, headers, cancel)
+        except BaseException:
+            self.release(pc, reusable=False)
+            raise
+        return UpstreamResponse(self, pc, res)
+
+    def _send(self, pc, method, path, headers, cancel=None):
+        pc.conn.request(method, path, headers=headers or {})
+        if cancel is not None:
+            cancel.bind(pc.conn)
+        return pc.conn.getresponse()
+
+    def drain(self):
+        """Stops handing out connections and closes the idle ones.
+
+        Connections still checked out are closed when they are released.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for pc in idle:
+            pc.conn.close()
+
+class PoolManager:
+    """One UpstreamPool per backend hostname."""
+
+    def __init__(self, **pool_options):
+        self.pool_options = pool_options
+        self._pools = {}  # hostname → UpstreamPool
+        self._lock = threading.Lock()
+
+    def create(self, name, host, port):
+        """Creates (or replaces) the pool for a backend."""
+        pool = UpstreamPool(host, port, **self.pool_options)
+        with self._lock:
+            old = self._pools.get(name)
+            self._pools[name] = pool
+        if old is not None:
+            old.drain()
+        return pool
+
+    def pool_for(self, name, host, port):
+        """Returns the backend's pool, creating it or replacing it if its address has changed."""
+        pool = self._pools.get(name)
+        if pool is None or pool.host != host or pool.port != int(port):
+            pool = self.create(name, host, port)
+        return pool
+
+    def get(self, name, host, port):
+        """Returns the backend's pool, or None if it has none (e.g. it was drained).
+
+        Unlike pool_for() this never creates a pool, so a request racing /rm
+        cannot bring back the pool it just drained. A pool whose backend
+        moved to another port is still replaced.
+        """
+        with self._lock:
+            pool = self._pools.get(name)
+            if pool is None or (pool.host == host and pool.port == int(port)):
+                return pool
+            old = pool
+            pool = self._pools[name] = UpstreamPool(host, port, **self.pool_options)
+        old.drain()
+        return pool
+
+    def drain(self, name):
+        with self._lock:
+            pool = self._pools.pop(name, None)
+        if pool is not None:
+            pool.drain()
+
+    def names(self):
+        return list(self._pools)
+
+    def __contains__(self, name):
+        return name in self._pools